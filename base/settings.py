@@ -42,7 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
-    'django.contrib.sitemaps',
+    'django.contrib.postgres',
     'django_ckeditor_5',
     'django_cleanup',
     'modules.system.apps.SystemConfig',
@@ -176,12 +176,136 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Novosibirsk'
 
+# Redis для буферов, счетчиков и прочих структур вне кеша Django
+REDIS_URL = 'redis://localhost:6379/0'
+
+# Учет просмотров статей: при VIEW_COUNT_BUFFER_ENABLED просмотры пишутся в буфер Redis,
+# а задача flush_view_buffer_task раз в VIEW_COUNT_FLUSH_INTERVAL секунд переносит их в БД
+VIEW_COUNT_BUFFER_ENABLED = False
+VIEW_COUNT_BUFFER_KEY = 'blog:views:buffer'
+VIEW_COUNT_FLUSH_INTERVAL = 30
+VIEW_COUNT_BATCH_SIZE = 1000
+# Время жизни блокировки переноса буфера: дольше самого долгого переноса
+VIEW_COUNT_FLUSH_LOCK_TIMEOUT = 10 * 60
+VIEW_COUNT_SKIP_CRAWLERS = True
+VIEW_COUNT_CRAWLER_PATTERN = r'bot|crawl|spider|slurp|archiver|facebookexternalhit|curl|wget|python-requests'
+
+# Суточные агрегаты просмотров (ArticleDailyViews)
+VIEW_ROLLUP_INTERVAL = 5 * 60
+VIEW_ROLLUP_BATCH_SIZE = 50000
+
+# Популярные статьи: окна в сутках по агрегатам ArticleDailyViews ('24h' - текущие сутки),
+# пересчитываются каждые POPULAR_ARTICLES_INTERVAL секунд в отсортированные множества Redis
+POPULAR_ARTICLES_WINDOWS = {'24h': 1, '7d': 7, '30d': 30}
+POPULAR_ARTICLES_SIZE = 50
+POPULAR_ARTICLES_INTERVAL = 5 * 60
+POPULAR_ARTICLES_KEY_PREFIX = 'blog:popular'
+
+# Облако тегов: количество тегов в сайдбаре и время жизни кеша списка
+TAG_CLOUD_SIZE = 30
+TAG_CLOUD_CACHE_TIMEOUT = 60 * 60
+
+# Похожие статьи: сколько кандидатов хранить, сколько показывать и бонусы за близость категорий
+SIMILAR_ARTICLES_STORED = 18
+SIMILAR_ARTICLES_SHOWN = 6
+SIMILAR_ARTICLES_CATEGORY_WEIGHT = 0.5
+SIMILAR_ARTICLES_TREE_WEIGHT = 0.2
+
+# Кеш фрагментов шаблонов ({% fragment_cache %}), сбрасывается сменой поколений групп данных
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Движок поиска статей: PostgresSearchBackend (полнотекстовый поиск PostgreSQL) или
+# MemorySearchBackend (инвертированный индекс в памяти процесса со снимком в SEARCH_INDEX_PATH, работает с SQLite)
+SEARCH_BACKEND = 'modules.blog.search.postgres.PostgresSearchBackend'
+SEARCH_INDEX_PATH = BASE_DIR / 'search_index.pickle'
+# Количество записей журнала изменений индекса, после которого он сворачивается в новый снимок
+SEARCH_INDEX_JOURNAL_LIMIT = 1000
+SEARCH_MAX_RESULTS = 1000
+
+# Пользователь считается в сети USER_ONLINE_TIMEOUT секунд после последнего запроса
+USER_ONLINE_TIMEOUT = 300
+
+# Время посещений: сортированное множество в Redis, перенос в User.last_login пачками по расписанию,
+# записи старше USER_LAST_SEEN_RETENTION секунд удаляются из множества
+USER_LAST_SEEN_KEY = 'presence:last_seen'
+USER_LAST_SEEN_FLUSH_INTERVAL = 60
+USER_LAST_SEEN_BATCH_SIZE = 1000
+USER_LAST_SEEN_FLUSH_LOCK_TIMEOUT = 10 * 60
+USER_LAST_SEEN_RETENTION = 60 * 60 * 24
+
+# Комментарии: корневых на странице (ответы подгружаются отдельно) и время жизни кеша HTML
+# (сбрасывается при изменении комментариев статьи)
+COMMENTS_PER_PAGE = 20
+COMMENT_THREAD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Подсказки поиска: минимальная и максимальная длина фрагмента, предел выдачи и время жизни кеша
+SEARCH_SUGGEST_MIN_LENGTH = 2
+SEARCH_SUGGEST_MAX_LENGTH = 64
+SEARCH_SUGGEST_LIMIT = 8
+SEARCH_SUGGEST_CACHE_TIMEOUT = 60
+
+# Ограничение частоты запросов к изменяющим данные представлениям (token bucket в Redis):
+# группа -> (емкость корзины, пополнение токенов в секунду)
+THROTTLE_ENABLED = True
+THROTTLE_RATES = {
+    'rating': (20, 1 / 3),
+    'comment': (5, 1 / 30),
+    'following': (10, 1 / 6),
+    'feedback': (3, 1 / 600),
+}
+
+# Кеш страниц целиком для анонимных посетителей (главная, статья, категория, тег). Страницы сбрасываются
+# сигналами по суррогатным ключам; просмотры, популярные статьи и последние комментарии в сайдбаре
+# могут отставать не больше чем на PAGE_CACHE_TIMEOUT секунд
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_TIMEOUT = 60 * 5
+
+# Sitemap: статические файлы в SITEMAP_ROOT (индекс и части по SITEMAP_SHARD_SIZE id объектов),
+# части с измененными объектами перестраиваются каждые SITEMAP_INTERVAL секунд
+SITEMAP_ROOT = BASE_DIR / 'sitemaps'
+SITEMAP_SHARD_SIZE = 10000
+SITEMAP_CHUNK_SIZE = 2000
+SITEMAP_PROTOCOL = 'https'
+SITEMAP_INTERVAL = 60 * 10
+
+# Ленты RSS/Atom: количество статей и время жизни кеша XML (сбрасывается при изменении статей ленты)
+FEED_ITEMS = 20
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Варианты изображений (WebP и JPEG) для srcset: ширины по имени поля ImageField и качество сжатия.
+# Создаются задачей generate_image_variants_task в MEDIA_ROOT/variants/
+IMAGE_VARIANT_WIDTHS = {
+    'thumbnail': (160, 320, 480, 640),
+    'avatar': (60, 120, 240, 360),
+}
+IMAGE_VARIANT_QUALITY = 80
+
 # Резервное копирование в 00:00celery -A backend beat -l info
 CELERY_BEAT_SCHEDULE = {
     'backup_database': {
         'task': 'modules.services.tasks.dbackup_task',
         'schedule': crontab(hour=0, minute=0),
     },
+    'flush_view_buffer': {
+        'task': 'modules.blog.tasks.flush_view_buffer_task',
+        'schedule': VIEW_COUNT_FLUSH_INTERVAL,
+    },
+    'rollup_daily_views': {
+        'task': 'modules.blog.tasks.rollup_daily_views_task',
+        'schedule': VIEW_ROLLUP_INTERVAL,
+    },
+    'rebuild_leaderboards': {
+        'task': 'modules.blog.tasks.rebuild_leaderboards_task',
+        'schedule': POPULAR_ARTICLES_INTERVAL,
+    },
+    'flush_last_seen': {
+        'task': 'modules.system.tasks.flush_last_seen_task',
+        'schedule': USER_LAST_SEEN_FLUSH_INTERVAL,
+    },
+    'regenerate_sitemaps': {
+        'task': 'modules.blog.tasks.regenerate_sitemaps_task',
+        'schedule': SITEMAP_INTERVAL,
+    },
 }
 
 # Настройки для ckeditor
@@ -274,6 +398,10 @@ CKEDITOR_5_CONFIGS = {
 
 CKEDITOR_5_FILE_STORAGE = 'modules.services.utils.CkeditorCustomStorage'
 
+# Загрузки редактора: наибольшая сторона изображения и качество пересжатия JPEG/WebP
+CKEDITOR_UPLOAD_MAX_SIZE = 1920
+CKEDITOR_UPLOAD_QUALITY = 85
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
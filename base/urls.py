@@ -15,18 +15,16 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf.urls.static import static
 from django.conf import settings
-from django.contrib.sitemaps.views import sitemap
 
-from modules.blog.sitemaps import ArticleSitemap, StaticSitemap
-from modules.blog.feeds import LatestArticlesFeed
+from modules.blog.sitemaps import sitemap_file
+from modules.blog.feeds import (LatestArticlesFeed, LatestArticlesAtomFeed, CategoryArticlesFeed,
+                                CategoryArticlesAtomFeed, TagArticlesFeed, TagArticlesAtomFeed,
+                                AuthorArticlesFeed, AuthorArticlesAtomFeed)
 
 
-sitemaps = {'static': StaticSitemap,
-            'articles': ArticleSitemap}
-
 handler403 = 'modules.system.views.tr_handler403'
 handler404 = 'modules.system.views.tr_handler404'
 handler500 = 'modules.system.views.tr_handler500'
@@ -34,8 +32,17 @@ handler500 = 'modules.system.views.tr_handler500'
 urlpatterns = [
     path('ckeditor5/', include('django_ckeditor_5.urls')),
     path('admin/', admin.site.urls),
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    # Файлы sitemap генерируются задачей regenerate_sitemaps_task в SITEMAP_ROOT
+    path('sitemap.xml', sitemap_file, {'name': 'sitemap.xml'}, name='sitemap'),
+    re_path(r'^(?P<name>sitemap-[a-z]+-\d+\.xml)$', sitemap_file, name='sitemap_shard'),
     path('feeds/latest/', LatestArticlesFeed(), name='latest_articles_feed'),
+    path('feeds/latest/atom/', LatestArticlesAtomFeed(), name='latest_articles_atom_feed'),
+    path('feeds/category/<str:slug>/', CategoryArticlesFeed(), name='category_articles_feed'),
+    path('feeds/category/<str:slug>/atom/', CategoryArticlesAtomFeed(), name='category_articles_atom_feed'),
+    path('feeds/tag/<str:slug>/', TagArticlesFeed(), name='tag_articles_feed'),
+    path('feeds/tag/<str:slug>/atom/', TagArticlesAtomFeed(), name='tag_articles_atom_feed'),
+    path('feeds/author/<str:slug>/', AuthorArticlesFeed(), name='author_articles_feed'),
+    path('feeds/author/<str:slug>/atom/', AuthorArticlesAtomFeed(), name='author_articles_atom_feed'),
     path('', include('modules.blog.urls')),
     path('', include('modules.system.urls')),
 ]
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from mptt.admin import DraggableMPTTAdmin
-from .models import Category, Article, Comment, ViewCount
+from .models import Category, Article, Comment, ViewCount, ArticleDailyViews
 
 
 @admin.register(Category)
@@ -35,4 +35,9 @@ class CommentAdminPage(DraggableMPTTAdmin):
 class ViewCountAdmin(admin.ModelAdmin):
     list_display = ('article', 'viewed_on', 'ip_address')
     list_filter = ('viewed_on',)
-    
\ No newline at end of file
+
+
+@admin.register(ArticleDailyViews)
+class ArticleDailyViewsAdmin(admin.ModelAdmin):
+    list_display = ('article', 'day', 'views', 'unique_ips')
+    list_filter = ('day',)
@@ -5,3 +5,7 @@ class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'modules.blog'
     verbose_name = 'Блог'
+
+    def ready(self):
+        # Подключение обработчиков сигналов (счетчики ArticleStats)
+        from . import signals  # noqa: F401
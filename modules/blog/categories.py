@@ -0,0 +1,79 @@
+from django.db.models import Count
+from django.urls import reverse
+
+from .models import Article, Category
+from modules.services.cache import get_generations
+
+
+class CategoryNode:
+    # Узел снимка дерева категорий (без обращения к БД)
+    def __init__(self, category):
+        self.id = category.id
+        self.title = category.title
+        self.slug = category.slug
+        self.parent_id = category.parent_id
+        self.tree_id = category.tree_id
+        self.lft = category.lft
+        self.rght = category.rght
+        self.level = category.level
+        self.article_count = 0
+        self.total_article_count = 0
+        self.children = []
+
+    def __str__(self):
+        return self.title
+
+    def get_absolute_url(self):
+        return reverse('articles_by_category', kwargs={'slug': self.slug})
+
+
+class CategoryTree:
+    # Снимок дерева категорий с количеством опубликованных статей по узлам (включая потомков)
+    def __init__(self, version):
+        self.version = version
+        categories = Category.objects.order_by('tree_id', 'lft')
+        self.nodes = [CategoryNode(category) for category in categories]
+        self.by_id = {node.id: node for node in self.nodes}
+        self.by_slug = {}
+        for node in self.nodes:
+            self.by_slug.setdefault(node.slug, node)
+            parent = self.by_id.get(node.parent_id)
+            if parent is not None:
+                parent.children.append(node)
+
+        counts = (Article.objects.filter(status='published').values('category_id')
+                  .annotate(total=Count('id')).order_by())
+        for row in counts:
+            node = self.by_id.get(row['category_id'])
+            if node is not None:
+                node.article_count = row['total']
+        # Обход от листьев к корням: сумма по потомкам
+        for node in sorted(self.nodes, key=lambda node: node.level, reverse=True):
+            node.total_article_count += node.article_count
+            parent = self.by_id.get(node.parent_id)
+            if parent is not None:
+                parent.total_article_count += node.total_article_count
+
+    @property
+    def roots(self):
+        return [node for node in self.nodes if node.parent_id is None]
+
+    def get_by_slug(self, slug):
+        return self.by_slug.get(slug)
+
+    def articles(self, node):
+        # Опубликованные статьи категории и всех ее потомков (диапазон lft/rght одного дерева)
+        return Article.objects.all().filter(category__tree_id=node.tree_id,
+                                            category__lft__gte=node.lft, category__rght__lte=node.rght)
+
+
+_category_tree = None
+
+
+def get_category_tree():
+    # Снимок перестраивается в процессе только при смене поколений категорий или статей
+    global _category_tree
+    version = tuple(sorted(get_generations('category', 'article').items()))
+    if _category_tree is None or _category_tree.version != version:
+        _category_tree = CategoryTree(version)
+    return _category_tree
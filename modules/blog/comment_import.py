@@ -0,0 +1,142 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .comments import invalidate_comment_threads
+from .models import ArticleStats, Comment, lock_comment_tree_ids
+from modules.services.cache import bump_generation
+from modules.services.page_cache import purge_pages_on_commit
+
+
+def parse_comment_row(data):
+    # Строка импорта: key и parent - ключи комментариев внутри файла, parent_id - id уже существующего комментария
+    time_create = parse_datetime(data['time_create']) if data.get('time_create') else timezone.now()
+    if timezone.is_naive(time_create):
+        time_create = timezone.make_aware(time_create)
+    return {
+        'key': str(data['key']),
+        'parent': str(data['parent']) if data.get('parent') is not None else None,
+        'parent_id': data.get('parent_id'),
+        'article_id': int(data['article_id']),
+        'author_id': int(data['author_id']),
+        'content': data['content'],
+        'status': data.get('status', 'published'),
+        'time_create': time_create,
+    }
+
+
+def layout_tree(root, children):
+    # Значения lft/rght/level дерева обходом со стеком вместо рекурсии: {узел: (lft, rght, level)}
+    layout, counter = {}, 1
+    stack = [(root, 0, iter(children.get(root, ())))]
+    lefts = {root: counter}
+    while stack:
+        node, level, pending = stack[-1]
+        child = next(pending, None)
+        if child is None:
+            stack.pop()
+            counter += 1
+            layout[node] = (lefts[node], counter, level)
+        else:
+            counter += 1
+            lefts[child] = counter
+            stack.append((child, level + 1, iter(children.get(child, ()))))
+    return layout
+
+
+def relayout_trees(tree_ids, batch_size):
+    # Пересчет lft/rght/level только затронутых деревьев: существующие узлы сохраняют порядок,
+    # новые ответы встают последними по времени создания (как при обычном добавлении комментария)
+    for tree_id in tree_ids:
+        nodes = list(Comment.objects.filter(tree_id=tree_id).order_by().only('id', 'parent_id', 'lft', 'time_create'))
+        nodes.sort(key=lambda node: (node.lft == 0, node.lft, node.time_create, node.id))
+        children = defaultdict(list)
+        roots = []
+        for node in nodes:
+            (children[node.parent_id] if node.parent_id else roots).append(node.id)
+        layout = layout_tree(roots[0], children)
+        updates = [Comment(id=node_id, lft=lft, rght=rght, level=level) for node_id, (lft, rght, level) in layout.items()]
+        Comment.objects.bulk_update(updates, ['lft', 'rght', 'level'], batch_size=batch_size)
+
+
+def import_comments(rows, batch_size=1000):
+    """
+    Массовый импорт комментариев без построчного Comment.save(): lft/rght/level/tree_id новых деревьев
+    считаются в Python, строки вставляются bulk_create по уровням вложенности (id родителя известен
+    после вставки предыдущего уровня). Деревья существующих комментариев, к которым добавлены ответы,
+    перестраиваются отдельно. Возвращает количество импортированных комментариев.
+    """
+    rows = {row['key']: row for row in rows}
+    children = defaultdict(list)
+    for row in rows.values():
+        if row['parent'] is not None:
+            if row['parent'] not in rows:
+                raise ValueError(f"Комментарий {row['key']}: родитель {row['parent']} не найден в импорте")
+            if rows[row['parent']]['article_id'] != row['article_id']:
+                raise ValueError(f"Комментарий {row['key']}: статья не совпадает со статьей родителя {row['parent']}")
+            children[row['parent']].append(row['key'])
+    for keys in children.values():
+        keys.sort(key=lambda key: (rows[key]['time_create'], key))
+
+    with transaction.atomic():
+        parent_ids = {row['parent_id'] for row in rows.values() if row['parent'] is None and row['parent_id']}
+        # Блокировка затронутых существующих деревьев на время импорта
+        existing = {comment.id: comment for comment in
+                    Comment.objects.select_for_update().filter(id__in=parent_ids)
+                    .only('id', 'article_id', 'tree_id', 'level')}
+        if len(existing) != len(parent_ids):
+            raise ValueError(f'Не найдены комментарии: {sorted(parent_ids - set(existing))}')
+        for row in rows.values():
+            if row['parent'] is None and row['parent_id'] and existing[row['parent_id']].article_id != row['article_id']:
+                raise ValueError(f"Комментарий {row['key']}: статья не совпадает со статьей родителя {row['parent_id']}")
+        affected_trees = sorted({comment.tree_id for comment in existing.values()})
+        list(Comment.objects.select_for_update().filter(tree_id__in=affected_trees).values_list('id', flat=True))
+
+        # Номера новых деревьев выделяются под той же блокировкой, что и при добавлении корня на сайте
+        lock_comment_tree_ids()
+        next_tree_id = (Comment.objects.aggregate(max_tree_id=Max('tree_id'))['max_tree_id'] or 0) + 1
+        roots = sorted((row for row in rows.values() if row['parent'] is None and not row['parent_id']),
+                       key=lambda row: (row['time_create'], row['key']))
+        # Узлы новых деревьев получают окончательные значения, ответы в существующие деревья - временные
+        levels = defaultdict(list)
+        for root in roots:
+            for key, (lft, rght, level) in layout_tree(root['key'], children).items():
+                rows[key].update(tree_id=next_tree_id, lft=lft, rght=rght, level=level)
+                levels[level].append(key)
+            next_tree_id += 1
+        for row in rows.values():
+            if row['parent'] is None and row['parent_id']:
+                parent = existing[row['parent_id']]
+                for key, (_, _, level) in layout_tree(row['key'], children).items():
+                    rows[key].update(tree_id=parent.tree_id, lft=0, rght=0, level=parent.level + 1 + level)
+                    levels[parent.level + 1 + level].append(key)
+        if sum(map(len, levels.values())) != len(rows):
+            raise ValueError('В импорте есть циклические ссылки на родителей')
+
+        ids = {}
+        for level in sorted(levels):
+            comments = []
+            for key in levels[level]:
+                row = rows[key]
+                comments.append(Comment(
+                    article_id=row['article_id'], author_id=row['author_id'], content=row['content'],
+                    status=row['status'], time_create=row['time_create'],
+                    parent_id=ids[row['parent']] if row['parent'] is not None else row['parent_id'],
+                    tree_id=row['tree_id'], lft=row['lft'], rght=row['rght'], level=row['level'],
+                ))
+            Comment.objects.bulk_create(comments, batch_size=batch_size)
+            ids.update((key, comment.id) for key, comment in zip(levels[level], comments))
+
+        relayout_trees(affected_trees, batch_size)
+
+        # bulk_create не отправляет post_save: счетчики, кеш комментариев и страниц статей обновляем сами
+        article_counts = Counter(row['article_id'] for row in rows.values())
+        for article_id, count in article_counts.items():
+            ArticleStats.objects.increment(article_id, comment_count=count)
+        transaction.on_commit(lambda: invalidate_comment_threads(list(article_counts)))
+        purge_pages_on_commit(*(f'article:{article_id}' for article_id in article_counts))
+        transaction.on_commit(lambda: bump_generation('comment'))
+    return len(rows)
@@ -0,0 +1,93 @@
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .models import Comment
+from modules.services.cache import bump_generation, get_generations
+from modules.services.paginator import CursorPaginator, decode_cursor
+from modules.system.presence import get_online_statuses
+
+
+PRESENCE_RE = re.compile(r'<!--presence:(\d+)-->')
+
+
+def comments_group(article_id):
+    # Группа поколений комментариев одной статьи: смена поколения сбрасывает все ее страницы и ветки
+    return f'comments:{article_id}'
+
+
+def build_comment_thread(comments):
+    # Вложенность без рекурсии: комментарии идут в порядке обхода дерева (tree_id, lft), поэтому
+    # перед каждым из них достаточно закрыть <ul> веток того же или более глубокого уровня
+    items, open_levels = [], []
+    for comment in comments:
+        closed = 0
+        while open_levels and open_levels[-1] >= comment.level:
+            open_levels.pop()
+            closed += 1
+        items.append((comment, range(closed)))
+        open_levels.append(comment.level)
+    return items, range(len(open_levels))
+
+
+def render_comments(comments, collapsed=False):
+    # collapsed: только корневые комментарии с кнопкой загрузки ответов
+    items, close_all = build_comment_thread(comments)
+    return render_to_string('blog/comments/comments_thread.html',
+                            {'items': items, 'close_all': close_all, 'collapsed': collapsed})
+
+
+def fill_presence(html):
+    # Статус "в сети" меняется чаще ветки комментариев, поэтому в кешированном HTML вместо него метки,
+    # которые заполняются одним запросом к кешу для всех авторов
+    user_ids = {int(user_id) for user_id in PRESENCE_RE.findall(html)}
+    if not user_ids:
+        return html
+    statuses = get_online_statuses(user_ids)
+    return PRESENCE_RE.sub(lambda match: 'Онлайн' if statuses[int(match.group(1))] else 'Не в сети', html)
+
+
+def get_or_render_comments(article_id, name, render):
+    # Кеш HTML комментариев статьи до изменения ее комментариев
+    generation = get_generations(comments_group(article_id))[comments_group(article_id)]
+    key = f'comments:{article_id}:{generation:.6f}:{name}'
+    result = cache.get(key)
+    if result is None:
+        result = render()
+        cache.set(key, result, settings.COMMENT_THREAD_CACHE_TIMEOUT)
+    return {**result, 'html': fill_presence(result['html'])}
+
+
+def get_comment_page(article_id, cursor=None):
+    # Страница корневых комментариев (keyset по tree_id): {'html', 'next_url'}
+    decoded = decode_cursor(cursor) if cursor else None
+    values, forward = decoded if decoded else (None, True)
+    if not forward:
+        values = None
+
+    def render():
+        roots = Comment.objects.filter(article_id=article_id, level=0).select_related('author__profile')
+        paginator = CursorPaginator(roots, per_page=settings.COMMENTS_PER_PAGE, ordering=('tree_id',))
+        page = paginator.get_page(cursor if values else None)
+        next_url = None
+        if page.next_cursor:
+            next_url = reverse('comment_list', kwargs={'pk': article_id}) + '?' + urlencode({'cursor': page.next_cursor})
+        return {'html': render_comments(page, collapsed=True), 'next_url': next_url}
+    return get_or_render_comments(article_id, f'page:{values[0] if values else "first"}', render)
+
+
+def get_comment_replies(comment):
+    # Все ответы на комментарий одним запросом по диапазону lft/rght его дерева
+    def render():
+        replies = (Comment.objects.filter(tree_id=comment.tree_id, lft__gt=comment.lft, rght__lt=comment.rght)
+                   .select_related('author__profile').order_by('lft'))
+        return {'html': render_comments(replies)}
+    return get_or_render_comments(comment.article_id, f'replies:{comment.id}', render)
+
+
+def invalidate_comment_threads(article_ids):
+    bump_generation(*[comments_group(article_id) for article_id in article_ids])
@@ -0,0 +1,43 @@
+from django.db.models import OuterRef, Subquery
+
+from .comments import comments_group
+from .models import Article, Comment, Rating
+from modules.services.cache import get_generations
+from modules.services.conditional import from_timestamp, latest, make_etag
+
+
+# Поколения данных сайдбара, который выводится на каждой странице
+SIDEBAR_GROUPS = ('category', 'tag', 'popular', 'article', 'comment')
+# Поколения данных списков статей (карточки выводят рейтинг и просмотры)
+LIST_GROUPS = SIDEBAR_GROUPS + ('rating', 'views')
+
+
+def list_validators(request):
+    # Списки статей: только поколения из кеша, без запросов к БД
+    generations = get_generations(*LIST_GROUPS)
+    last_modified = from_timestamp(max(generations.values()))
+    return make_etag(request.user.pk, *(generations[group] for group in LIST_GROUPS)), last_modified
+
+
+def article_validators(request, slug):
+    # Статья: время изменения, последние комментарий и оценка одним запросом, удаления - по счетчикам и поколениям.
+    # (article_id, etag, last_modified) или None, если статьи нет
+    row = (Article.objects.filter(slug=slug, status='published')
+           .annotate(last_comment=Subquery(Comment.objects.filter(article=OuterRef('pk'))
+                                           .order_by('-time_update').values('time_update')[:1]),
+                     last_rating=Subquery(Rating.objects.filter(article=OuterRef('pk'))
+                                          .order_by('-time_create').values('time_create')[:1]))
+           .values_list('id', 'time_update', 'last_comment', 'last_rating',
+                        'stats__likes', 'stats__dislikes', 'stats__comment_count')
+           .first())
+    if row is None:
+        return None
+    article_id, time_update, last_comment, last_rating, *counters = row
+    groups = (comments_group(article_id), *SIDEBAR_GROUPS)
+    generations = get_generations(*groups)
+    last_modified = latest(time_update, last_comment, last_rating,
+                           *(from_timestamp(generations[group]) for group in groups))
+    etag = make_etag(request.user.pk, time_update, last_comment, last_rating, *counters,
+                     *(generations[group] for group in groups))
+    return article_id, etag, last_modified
+
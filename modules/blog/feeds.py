@@ -1,21 +1,174 @@
+from hashlib import md5
+
+from django.conf import settings
 from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import parse_http_date_safe
+from taggit.models import Tag
+
+from .categories import get_category_tree
 from .models import Article
+from modules.services.conditional import conditional_get, from_timestamp
+from modules.system.models import Profile
+
+
+FEED_FORMATS = ('rss', 'atom')
+
+
+def feed_cache_key(kind, slug, feed_format, full):
+    # Ключ строится из параметров URL, поэтому ответ из кеша не требует запросов к БД
+    return f'feed:{kind}:{slug or ""}:{feed_format}:{int(full)}'
+
+
+def invalidate_feeds(*feeds):
+    # feeds - пары (вид ленты, slug): удаляются все форматы и варианты с полным текстом
+    cache.delete_many([feed_cache_key(kind, slug, feed_format, full)
+                       for kind, slug in set(feeds) for feed_format in FEED_FORMATS for full in (False, True)])
+
+
+def invalidate_feeds_on_commit(*feeds):
+    transaction.on_commit(lambda: invalidate_feeds(*feeds))
+
 
+class FeedSource:
+    # Содержимое ленты: заголовки и выборка статей
+    def __init__(self, title, link, description, articles, full):
+        self.title = title
+        self.link = link
+        self.description = description
+        self.articles = articles
+        self.full = full
 
-class LatestArticlesFeed(Feed):
-    title = "Ваш сайт - последние статьи"
-    link = '/Feeds/'
-    description = "Новые статьи на моем сайте"
 
-    def items(self):
-        return Article.objects.order_by('-time_update')[:5]
+class ArticleFeed(Feed):
+    """
+    Базовая лента статей (RSS 2.0, формат Atom - у наследников с feed_format = 'atom').
+    ?full=1 выводит полный текст статей. Сериализованный XML кешируется по ключу ленты
+    и удаляется сигналами при сохранении статьи, которая в нее входит.
+    """
+    feed_kind = None
+    feed_format = 'rss'
+
+    def __call__(self, request, *args, **kwargs):
+        full = request.GET.get('full') == '1'
+        key = feed_cache_key(self.feed_kind, kwargs.get('slug'), self.feed_format, full)
+        entry = cache.get(key)
+        if entry is None:
+            response = super().__call__(request, *args, **kwargs)
+            last_modified = parse_http_date_safe(response.get('Last-Modified', ''))
+            entry = {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'etag': f'"{md5(response.content).hexdigest()}"',
+                'last_modified': from_timestamp(last_modified) if last_modified else None,
+            }
+            cache.set(key, entry, settings.FEED_CACHE_TIMEOUT)
+        return conditional_get(request, lambda: (entry['etag'], entry['last_modified']),
+                               lambda: HttpResponse(entry['content'], content_type=entry['content_type']))
+
+    def get_object(self, request, slug=None):
+        return self.get_source(slug, full=request.GET.get('full') == '1')
+
+    def get_source(self, slug, full):
+        raise NotImplementedError
+
+    def title(self, source):
+        return source.title
+
+    def link(self, source):
+        return source.link
+
+    def description(self, source):
+        return source.description
+
+    def subtitle(self, source):
+        return source.description
+
+    def items(self, source):
+        articles = list(source.articles.order_by('-time_update')[:settings.FEED_ITEMS])
+        for article in articles:
+            article.feed_description = article.full_description if source.full else article.short_description
+        return articles
 
     def item_title(self, item):
         return item.title
 
     def item_description(self, item):
-        return item.short_description
+        return item.feed_description
 
     def item_link(self, item):
         return reverse('articles_detail', args=[item.slug])
+
+    def item_author_name(self, item):
+        return item.author.username
+
+    def item_pubdate(self, item):
+        return item.time_create
+
+    def item_updateddate(self, item):
+        return item.time_update
+
+
+class LatestArticlesFeed(ArticleFeed):
+    feed_kind = 'latest'
+
+    def get_source(self, slug, full):
+        return FeedSource('Ваш сайт - последние статьи', reverse('home'), 'Новые статьи на моем сайте',
+                          Article.objects.all(), full)
+
+
+class CategoryArticlesFeed(ArticleFeed):
+    # Статьи категории и всех ее подкатегорий
+    feed_kind = 'category'
+
+    def get_source(self, slug, full):
+        category_tree = get_category_tree()
+        category = category_tree.get_by_slug(slug)
+        if category is None:
+            raise Http404('Категория не найдена')
+        return FeedSource(f'Статьи из категории: {category.title}', category.get_absolute_url(),
+                          f'Новые статьи из категории {category.title}', category_tree.articles(category), full)
+
+
+class TagArticlesFeed(ArticleFeed):
+    feed_kind = 'tag'
+
+    def get_source(self, slug, full):
+        tag = get_object_or_404(Tag, slug=slug)
+        return FeedSource(f'Статьи по тегу: {tag.name}', reverse('articles_by_tags', args=[tag.slug]),
+                          f'Новые статьи по тегу {tag.name}', Article.objects.all().filter(tags__slug=tag.slug), full)
+
+
+class AuthorArticlesFeed(ArticleFeed):
+    feed_kind = 'author'
+
+    def get_source(self, slug, full):
+        profile = get_object_or_404(Profile.objects.select_related('user'), slug=slug)
+        return FeedSource(f'Статьи автора: {profile.user.username}', profile.get_absolute_url(),
+                          f'Новые статьи автора {profile.user.username}',
+                          Article.objects.all().filter(author_id=profile.user_id), full)
+
+
+class LatestArticlesAtomFeed(LatestArticlesFeed):
+    feed_type = Atom1Feed
+    feed_format = 'atom'
+
+
+class CategoryArticlesAtomFeed(CategoryArticlesFeed):
+    feed_type = Atom1Feed
+    feed_format = 'atom'
+
+
+class TagArticlesAtomFeed(TagArticlesFeed):
+    feed_type = Atom1Feed
+    feed_format = 'atom'
+
+
+class AuthorArticlesAtomFeed(AuthorArticlesFeed):
+    feed_type = Atom1Feed
+    feed_format = 'atom'
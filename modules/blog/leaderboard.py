@@ -0,0 +1,65 @@
+from django.conf import settings
+
+from .models import Article, ArticleDailyViews
+from modules.services.cache import bump_generation
+from modules.services.redis_client import get_redis_connection
+
+
+def leaderboard_key(window):
+    return f'{settings.POPULAR_ARTICLES_KEY_PREFIX}:{window}'
+
+
+def get_window_rows(days, count):
+    # Лидеры окна по суточным агрегатам: просмотры за окно, при равенстве - за сегодня
+    return ArticleDailyViews.objects.views_in_last_days(days).filter(article__status='published')[:count]
+
+
+def leaderboard_score(row):
+    # Дробная часть (< 1) упорядочивает статьи с равным числом просмотров по просмотрам за сегодня
+    total_views, today_views = row['total_views'], row['today_views'] or 0
+    return total_views + today_views / (total_views + 1)
+
+
+def rebuild_leaderboards():
+    # Пересчет всех окон и атомарная замена отсортированных множеств в Redis
+    redis = get_redis_connection()
+    pipe = redis.pipeline(transaction=True)
+    for window, days in settings.POPULAR_ARTICLES_WINDOWS.items():
+        key = leaderboard_key(window)
+        scores = {row['article_id']: leaderboard_score(row)
+                  for row in get_window_rows(days, settings.POPULAR_ARTICLES_SIZE)}
+        pipe.delete(f'{key}:new')
+        if scores:
+            pipe.zadd(f'{key}:new', scores)
+            pipe.rename(f'{key}:new', key)
+        else:
+            pipe.delete(key)
+        # Отметка о пересчете: пустое окно не должно считаться по агрегатам на каждом запросе
+        pipe.set(f'{key}:built', 1)
+    pipe.execute()
+    bump_generation('popular')
+
+
+def get_popular_articles(window, count):
+    # Топ статей окна: id из Redis и одна выборка статей из БД
+    key = leaderboard_key(window)
+    redis = get_redis_connection()
+    pipe = redis.pipeline(transaction=False)
+    pipe.zrevrange(key, 0, count - 1, withscores=True)
+    pipe.exists(f'{key}:built')
+    top, built = pipe.execute()
+    if built:
+        top = [(int(article_id), int(score)) for article_id, score in top]
+    else:
+        # Лидеры еще не посчитаны (первый запуск) - берем напрямую из агрегатов
+        days = settings.POPULAR_ARTICLES_WINDOWS[window]
+        top = [(row['article_id'], row['total_views']) for row in get_window_rows(days, count)]
+
+    articles = Article.objects.filter(status='published').in_bulk([article_id for article_id, _ in top])
+    popular_articles_list = []
+    for article_id, views in top:
+        article = articles.get(article_id)
+        if article is not None:
+            article.total_view_count = views
+            popular_articles_list.append(article)
+    return popular_articles_list
@@ -0,0 +1,20 @@
+from django.core.management import BaseCommand
+
+from modules.blog.rollups import rollup_views, reset_views_rollup
+
+
+class Command(BaseCommand):
+    """
+    Команда для заполнения суточных агрегатов просмотров (ArticleDailyViews) по таблице ViewCount
+    """
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Удалить агрегаты и пересчитать с начала')
+        parser.add_argument('--batch-size', type=int, default=None, help='Размер пачки строк ViewCount')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            self.stdout.write('Removing existing rollups...')
+            reset_views_rollup()
+        self.stdout.write('Rolling up article views...')
+        processed = rollup_views(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} views'))
@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+
+from modules.blog.sitemaps import build_sitemaps
+
+
+class Command(BaseCommand):
+    """
+    Команда для полной генерации файлов sitemap в SITEMAP_ROOT (индекс и все части)
+    """
+    def handle(self, *args, **options):
+        self.stdout.write('Building sitemaps...')
+        total = build_sitemaps()
+        self.stdout.write(self.style.SUCCESS(f'Sitemap index written with {total} shards'))
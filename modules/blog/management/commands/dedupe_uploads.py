@@ -0,0 +1,91 @@
+import hashlib
+import os
+from urllib.parse import urljoin
+
+from django.core.files import File
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from modules.blog.models import Article
+from modules.blog.signals import purge_article_caches
+from modules.services.utils import CkeditorCustomStorage
+
+
+class Command(BaseCommand):
+    """
+    Команда для перевода загрузок CKEditor (media/uploads) в хранилище с адресацией по содержимому:
+    файлы пересохраняются под хешем содержимого (одинаковые - в один файл), ссылки в текстах статей
+    заменяются, старые файлы удаляются (после подтверждения или с --noinput; --keep-originals оставляет их)
+    """
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать файлы и дубликаты')
+        parser.add_argument('--keep-originals', action='store_true', help='Не удалять исходные файлы')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Не запрашивать подтверждение удаления исходных файлов')
+
+    def handle(self, *args, **options):
+        storage = CkeditorCustomStorage()
+        names = []
+        for root, _, file_names in os.walk(storage.location):
+            for file_name in file_names:
+                name = os.path.relpath(os.path.join(root, file_name), storage.location).replace(os.sep, '/')
+                if not storage.CONTENT_NAME_RE.match(name):
+                    names.append(name)
+        size_before = sum(storage.size(name) for name in names)
+
+        if options['dry_run']:
+            digests = set()
+            for name in names:
+                with storage.open(name) as content:
+                    digests.add(hashlib.sha256(content.read()).hexdigest())
+            self.stdout.write(f'{len(names)} files ({size_before} bytes), {len(names) - len(digests)} duplicates')
+            return
+
+        delete_originals = not options['keep_originals']
+        if delete_originals and options['interactive']:
+            answer = input(f'{len(names)} files in {storage.location} will be moved and the originals deleted. '
+                           f'Type "yes" to continue: ')
+            if answer != 'yes':
+                self.stdout.write('Cancelled')
+                return
+
+        renames = {}
+        for name in sorted(names):
+            with storage.open(name) as content:
+                renames[name] = storage.save(name, File(content, name=name))
+        # Ссылки в текстах: URL хранилища (с кодированием не-ASCII символов) и исходное имя как есть
+        replacements = {}
+        for old_name, new_name in renames.items():
+            replacements[storage.url(old_name)] = storage.url(new_name)
+            replacements[urljoin(storage.base_url, old_name)] = storage.url(new_name)
+
+        changed = []
+        with transaction.atomic():
+            articles = Article.objects.order_by().values_list('id', 'short_description', 'full_description')
+            for article_id, short_description, full_description in articles.iterator():
+                updated = {}
+                for field, text in (('short_description', short_description), ('full_description', full_description)):
+                    new_text = text
+                    for old_url, new_url in replacements.items():
+                        if old_url in new_text:
+                            new_text = new_text.replace(old_url, new_url)
+                    if new_text != text:
+                        updated[field] = new_text
+                if updated:
+                    Article.objects.filter(id=article_id).update(**updated)
+                    changed.append(article_id)
+            # update() не отправляет сигналы: кеш страниц и лент со старыми ссылками сбрасываем сами
+            for article in Article.objects.filter(id__in=changed).select_related('category'):
+                purge_article_caches(article)
+
+        if delete_originals:
+            for old_name in renames:
+                storage.delete(old_name)
+            for root, _, _ in os.walk(storage.location, topdown=False):
+                if root.rstrip(os.sep) != storage.location.rstrip(os.sep) and not os.listdir(root):
+                    os.rmdir(root)
+        size_after = sum(storage.size(name) for name in set(renames.values()))
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(renames)} files moved into {len(set(renames.values()))} ({size_before} -> {size_after} bytes), '
+            f'links updated in {len(changed)} articles'
+        ))
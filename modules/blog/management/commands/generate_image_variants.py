@@ -0,0 +1,30 @@
+from django.core.management import BaseCommand
+
+from modules.blog.models import Article
+from modules.services.images import generate_image_variants, get_image_variants
+from modules.system.models import Profile
+
+
+class Command(BaseCommand):
+    """
+    Команда для создания вариантов размеров уже загруженных превью статей и аватаров,
+    включая изображения по умолчанию
+    """
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересоздать уже существующие варианты')
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, field_name in ((Article, 'thumbnail'), (Profile, 'avatar')):
+            names = set(model.objects.order_by().values_list(field_name, flat=True).distinct())
+            names.add(model._meta.get_field(field_name).default)
+            for name in sorted(filter(None, names)):
+                if not options['force'] and get_image_variants(name, field_name):
+                    continue
+                try:
+                    generate_image_variants(name, field_name)
+                except (OSError, ValueError) as error:
+                    self.stderr.write(f'{name}: {error}')
+                    continue
+                total += 1
+        self.stdout.write(self.style.SUCCESS(f'Image variants generated for {total} images'))
@@ -0,0 +1,26 @@
+import json
+
+from django.core.management import BaseCommand, CommandError
+
+from modules.blog.comment_import import import_comments, parse_comment_row
+
+
+class Command(BaseCommand):
+    """
+    Команда для массового импорта комментариев из файла JSON Lines. Поля строки: key, parent (key родителя
+    в файле) или parent_id (id существующего комментария), article_id, author_id, content, time_create, status
+    """
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу .jsonl')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Количество строк в одном INSERT')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Reading {options['path']}...")
+        try:
+            with open(options['path'], encoding='utf-8') as file:
+                rows = [parse_comment_row(json.loads(line)) for line in file if line.strip()]
+            self.stdout.write(f'Importing {len(rows)} comments...')
+            total = import_comments(rows, options['batch_size'])
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'Import failed: {error!r}')
+        self.stdout.write(self.style.SUCCESS(f'Imported {total} comments'))
@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand
+
+from modules.blog.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """
+    Команда для полного пересчета поискового индекса статей текущего движка поиска
+    """
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Количество статей в одной пачке')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f'Rebuilding search index ({backend.__class__.__name__})...')
+        total = backend.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt for {total} articles'))
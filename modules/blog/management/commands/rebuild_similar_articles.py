@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+
+from modules.blog.similarity import rebuild_similar_articles
+
+
+class Command(BaseCommand):
+    """
+    Команда для полного пересчета индекса похожих статей (SimilarArticle)
+    """
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding similar articles...')
+        total = rebuild_similar_articles()
+        self.stdout.write(self.style.SUCCESS(f'Similar articles rebuilt for {total} articles'))
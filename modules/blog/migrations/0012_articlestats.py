@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:23
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+import django.db.models.deletion
+
+
+def fill_article_stats(apps, schema_editor):
+    # Заполнение счетчиков для уже существующих статей
+    Article = apps.get_model('blog', 'Article')
+    ArticleStats = apps.get_model('blog', 'ArticleStats')
+    Rating = apps.get_model('blog', 'Rating')
+    ViewCount = apps.get_model('blog', 'ViewCount')
+    Comment = apps.get_model('blog', 'Comment')
+
+    ratings = {row['article_id']: row for row in Rating.objects.values('article_id').annotate(
+        rating_sum=Sum('value'), likes=Count('id', filter=Q(value=1)), dislikes=Count('id', filter=Q(value=-1)))}
+    views = dict(ViewCount.objects.values('article_id').annotate(total=Count('id')).values_list('article_id', 'total'))
+    comments = dict(Comment.objects.values('article_id').annotate(total=Count('id')).values_list('article_id', 'total'))
+
+    stats = []
+    for article_id in Article.objects.values_list('id', flat=True).iterator():
+        rating = ratings.get(article_id, {})
+        stats.append(ArticleStats(
+            article_id=article_id,
+            rating_sum=rating.get('rating_sum') or 0,
+            likes=rating.get('likes', 0),
+            dislikes=rating.get('dislikes', 0),
+            view_count=views.get(article_id, 0),
+            comment_count=comments.get(article_id, 0),
+        ))
+    ArticleStats.objects.bulk_create(stats, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_rename_ip_adress_viewcount_ip_address'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleStats',
+            fields=[
+                ('article', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='blog.article', verbose_name='Статья')),
+                ('rating_sum', models.IntegerField(default=0, verbose_name='Сумма рейтинга')),
+                ('likes', models.IntegerField(default=0, verbose_name='Нравится')),
+                ('dislikes', models.IntegerField(default=0, verbose_name='Не нравится')),
+                ('view_count', models.IntegerField(default=0, verbose_name='Просмотры')),
+                ('comment_count', models.IntegerField(default=0, verbose_name='Комментарии')),
+            ],
+            options={
+                'verbose_name': 'Статистика статьи',
+                'verbose_name_plural': 'Статистика статей',
+                'db_table': 'app_article_stats',
+            },
+        ),
+        migrations.RunPython(fill_article_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:24
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+import django.utils.timezone
+
+
+def remove_duplicate_views(apps, schema_editor):
+    # Перед добавлением уникального ограничения оставляем по одному (самому раннему) просмотру
+    ViewCount = apps.get_model('blog', 'ViewCount')
+    ArticleStats = apps.get_model('blog', 'ArticleStats')
+    duplicates = (ViewCount.objects.values('article_id', 'ip_address')
+                  .annotate(first_id=Min('id'), total=Count('id')).filter(total__gt=1))
+    articles = set()
+    for row in duplicates.iterator():
+        (ViewCount.objects.filter(article_id=row['article_id'], ip_address=row['ip_address'])
+         .exclude(id=row['first_id']).delete())
+        articles.add(row['article_id'])
+    for article_id in articles:
+        ArticleStats.objects.filter(article_id=article_id).update(
+            view_count=ViewCount.objects.filter(article_id=article_id).count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_articlestats'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_views, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='viewcount',
+            name='viewed_on',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата просмотров'),
+        ),
+        migrations.AddConstraint(
+            model_name='viewcount',
+            constraint=models.UniqueConstraint(fields=('article', 'ip_address'), name='unique_article_view'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_viewcount_unique_article_view'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Название')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Последний обработанный ID')),
+                ('time_update', models.DateTimeField(auto_now=True, verbose_name='Время обновления')),
+            ],
+            options={
+                'verbose_name': 'Отметка агрегации',
+                'verbose_name_plural': 'Отметки агрегации',
+                'db_table': 'app_rollup_watermarks',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArticleDailyViews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('views', models.IntegerField(default=0, verbose_name='Просмотры')),
+                ('unique_ips', models.IntegerField(default=0, verbose_name='Уникальные IP')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='blog.article', verbose_name='Статья')),
+            ],
+            options={
+                'verbose_name': 'Просмотры за день',
+                'verbose_name_plural': 'Просмотры по дням',
+                'db_table': 'app_article_daily_views',
+                'ordering': ('-day',),
+                'indexes': [models.Index(fields=['day', 'article'], name='app_article_day_59b2d7_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='articledailyviews',
+            constraint=models.UniqueConstraint(fields=('article', 'day'), name='unique_article_day_views'),
+        ),
+    ]
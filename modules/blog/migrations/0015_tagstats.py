@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:26
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_tag_stats(apps, schema_editor):
+    # Подсчет опубликованных статей для уже существующих тегов
+    Article = apps.get_model('blog', 'Article')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    TagStats = apps.get_model('blog', 'TagStats')
+
+    content_type = ContentType.objects.filter(app_label='blog', model='article').first()
+    if content_type is None:
+        return
+    published_ids = Article.objects.filter(status='published').values('id')
+    counts = (TaggedItem.objects.filter(content_type=content_type, object_id__in=published_ids)
+              .values('tag_id').annotate(total=Count('id')).order_by())
+    TagStats.objects.bulk_create(
+        [TagStats(tag_id=row['tag_id'], published_count=row['total']) for row in counts], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0005_auto_20220424_2025'),
+        ('blog', '0014_articledailyviews_rollupwatermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagStats',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='taggit.tag', verbose_name='Тег')),
+                ('published_count', models.IntegerField(db_index=True, default=0, verbose_name='Опубликованных статей')),
+            ],
+            options={
+                'verbose_name': 'Статистика тега',
+                'verbose_name_plural': 'Статистика тегов',
+                'db_table': 'app_tag_stats',
+            },
+        ),
+        migrations.RunPython(fill_tag_stats, migrations.RunPython.noop),
+    ]
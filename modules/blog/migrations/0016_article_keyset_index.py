@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_tagstats'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='article',
+            options={'ordering': ['-fixed', '-time_create', 'id'], 'verbose_name': 'Статья', 'verbose_name_plural': 'Статьи'},
+        ),
+        migrations.RemoveIndex(
+            model_name='article',
+            name='app_article_fixed_e300bf_idx',
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['status', '-fixed', '-time_create', 'id'], name='app_article_status_1b7cf5_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_article_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Оценка сходства')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_entries', to='blog.article', verbose_name='Статья')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.article', verbose_name='Похожая статья')),
+            ],
+            options={
+                'verbose_name': 'Похожая статья',
+                'verbose_name_plural': 'Похожие статьи',
+                'db_table': 'app_similar_articles',
+                'ordering': ('-score',),
+                'indexes': [models.Index(fields=['article', '-score'], name='app_similar_article_507c69_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similararticle',
+            constraint=models.UniqueConstraint(fields=('article', 'similar'), name='unique_similar_article'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:31
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import F, Func, TextField, Value
+
+
+def fill_search_vectors(apps, schema_editor):
+    # Поисковые векторы для уже существующих статей (то же выражение, что в modules/blog/search/postgres.py)
+    Article = apps.get_model('blog', 'Article')
+    full_description = Func(F('full_description'), Value('<[^>]+>'), Value(' '), Value('g'),
+                            function='regexp_replace', output_field=TextField())
+    Article.objects.update(search_vector=SearchVector(F('title'), weight='A', config='russian')
+                           + SearchVector(full_description, weight='B', config='russian'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0017_similararticle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='app_article_search__8c4d79_gin'),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import F, Func, TextField, Value
+
+from modules.services.operations import PostgreSQLOnly
+
+
+def fill_search_vectors(apps, schema_editor):
+    # Поисковые векторы для уже существующих статей (то же выражение, что в modules/blog/search/postgres.py)
+    Article = apps.get_model('blog', 'Article')
+    full_description = Func(F('full_description'), Value('<[^>]+>'), Value(' '), Value('g'),
+                            function='regexp_replace', output_field=TextField())
+    Article.objects.update(search_vector=SearchVector(F('title'), weight='A', config='russian')
+                           + SearchVector(full_description, weight='B', config='russian'))
+
+
+class Migration(migrations.Migration):
+    # Миграции 0018 и 0019 для новых БД: GIN-индексы, заполнение tsvector и триграммный индекс тегов
+    # создаются только в PostgreSQL, поэтому схема применяется и в SQLite (MemorySearchBackend).
+    # В БД, где 0018 и 0019 уже применены, эта миграция считается примененной
+
+    replaces = [
+        ('blog', '0018_article_search_vector'),
+        ('blog', '0019_trigram_indexes'),
+    ]
+
+    dependencies = [
+        ('blog', '0017_similararticle'),
+        ('taggit', '0005_auto_20220424_2025'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        PostgreSQLOnly(migrations.AddIndex(
+            model_name='article',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='app_article_search__8c4d79_gin'),
+        )),
+        PostgreSQLOnly(migrations.RunPython(fill_search_vectors, migrations.RunPython.noop)),
+        TrigramExtension(),
+        PostgreSQLOnly(migrations.AddIndex(
+            model_name='article',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='app_articles_title_trgm', opclasses=['gin_trgm_ops']),
+        )),
+        # Таблица тегов принадлежит taggit, поэтому индекс создается вручную
+        PostgreSQLOnly(migrations.RunSQL(
+            'CREATE INDEX taggit_tag_name_trgm ON taggit_tag USING gin (name gin_trgm_ops);',
+            'DROP INDEX IF EXISTS taggit_tag_name_trgm;',
+        )),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:12
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0018_article_search_vector'),
+        ('taggit', '0005_auto_20220424_2025'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='article',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='app_articles_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        # Таблица тегов принадлежит taggit, поэтому индекс создается вручную
+        migrations.RunSQL(
+            'CREATE INDEX taggit_tag_name_trgm ON taggit_tag USING gin (name gin_trgm_ops);',
+            'DROP INDEX IF EXISTS taggit_tag_name_trgm;',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:43
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0019_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='time_create',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время добавления'),
+        ),
+    ]
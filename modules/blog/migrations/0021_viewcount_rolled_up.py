@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:14
+
+from django.db import migrations, models
+
+
+def mark_rolled_up_views(apps, schema_editor):
+    # Просмотры до прежней отметки по id уже учтены в ArticleDailyViews
+    RollupWatermark = apps.get_model('blog', 'RollupWatermark')
+    ViewCount = apps.get_model('blog', 'ViewCount')
+    watermark = RollupWatermark.objects.filter(name='article_daily_views').first()
+    if watermark is not None:
+        ViewCount.objects.filter(id__lte=watermark.last_id).update(rolled_up=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0020_comment_time_create_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='viewcount',
+            name='rolled_up',
+            field=models.BooleanField(default=False, verbose_name='Учтен в суточных агрегатах'),
+        ),
+        migrations.RunPython(mark_rolled_up_views, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='viewcount',
+            index=models.Index(condition=models.Q(('rolled_up', False)), fields=['id'], name='viewcount_pending_rollup'),
+        ),
+    ]
@@ -1,5 +1,6 @@
-from .models import ViewCount
-from modules.services.utils import get_client_ip
+from .conditional import list_validators
+from .tracking import record_view
+from ..services.mixins import ConditionalGetMixin, PageCacheMixin
 
 
 class ViewCountMixin:
@@ -7,7 +8,20 @@ class ViewCountMixin:
     def get_object(self):
         # Получение статьи из метода родительского класса
         obj = super().get_object()
-        ip_address = get_client_ip(self.request)
-        # Получаем или создаем запись о просмотре статьи для данного пользователя
-        ViewCount.objects.get_or_create(article=obj, ip_address=ip_address)
+        # Запись о просмотре статьи для данного пользователя (в БД или в буфер Redis)
+        record_view(self.request, obj.id)
         return obj
+
+
+class ArticleListPageCacheMixin(PageCacheMixin):
+    # Список статей помечается ключами статей страницы: их рейтинг и комментарии выводятся в списке
+
+    def get_page_cache_keys(self, context):
+        return super().get_page_cache_keys(context) + [f'article:{article.id}' for article in context['object_list']]
+
+
+class ArticleListConditionalMixin(ConditionalGetMixin):
+    # ETag и Last-Modified списков статей по поколениям данных
+
+    def get_validators(self):
+        return list_validators(self.request)
@@ -1,10 +1,19 @@
-from django.db import models
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.db.models import F, Sum, Count, Q
+from datetime import timedelta
 from django.core.validators import FileExtensionValidator
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
 from taggit.managers import TaggableManager
+from taggit.models import Tag
 from mptt.models import MPTTModel, TreeForeignKey
-from modules.services.utils import unique_slugify, image_compress
+from modules.services.cache import bump_generation
+from modules.services.utils import unique_slugify
 from django_ckeditor_5.fields import CKEditor5Field
 
 
@@ -45,13 +54,12 @@ class Article(models.Model):
     class ArticleManager(models.Manager):
         def all(self):
             # Список статей (SQL запрос с фильтрацией для страницы списка статей)
-            return (self.get_queryset().select_related('author', 'category').prefetch_related('ratings', 'views')
+            return (self.get_queryset().select_related('author', 'category', 'stats')
                     .filter(status='published'))
 
         def detail(self):
-            # развернутая статья (SQL запрос с фильтрацией)
-            return (self.get_queryset().select_related('author', 'category').prefetch_related(
-                    'comments', 'comments__author', 'comments__author__profile', 'tags', 'ratings')
+            # развернутая статья (SQL запрос с фильтрацией), комментарии выводятся из кеша отдельным запросом
+            return (self.get_queryset().select_related('author', 'category', 'stats').prefetch_related('tags')
                     .filter(status='published'))
 
     STATUS_OPTIONS = (
@@ -79,19 +87,31 @@ class Article(models.Model):
     updater = models.ForeignKey(to=User, verbose_name='Обновил',
                                 on_delete=models.SET_NULL, null=True, related_name='updater_posts', blank=True)
     fixed = models.BooleanField(verbose_name='Зафиксировано', default=False)
+    search_vector = SearchVectorField(verbose_name='Поисковый вектор', null=True, editable=False)
     objects = ArticleManager()
     tags = TaggableManager()
 
     class Meta:
         db_table = 'app_articles'
-        ordering = ['-fixed', '-time_create']
-        indexes = [models.Index(fields=['-fixed', '-time_create', 'status'])]
+        ordering = ['-fixed', '-time_create', 'id']
+        # Индекс соответствует сортировке и курсорной пагинации списков опубликованных статей
+        indexes = [
+            models.Index(fields=['status', '-fixed', '-time_create', 'id']),
+            GinIndex(fields=['search_vector']),
+            GinIndex(fields=['title'], name='app_articles_title_trgm', opclasses=['gin_trgm_ops']),
+        ]
         verbose_name = 'Статья'
         verbose_name_plural = 'Статьи'
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.__thumbnail = self.thumbnail if self.pk else None
+        # Имя превью до изменения (без обращения к полю: оно может быть отложено в only()/defer()),
+        # новое превью получает варианты размеров в Celery (modules/blog/signals.py)
+        self.initial_thumbnail = self.__dict__.get('thumbnail') if self.pk else None
+        # Статус до изменения, нужен для пересчета счетчиков тегов (TagStats)
+        self.initial_status = self.__dict__.get('status')
+        # Категория до изменения: при переносе статьи сбрасывается кеш страниц обеих категорий
+        self.initial_category_id = self.__dict__.get('category_id')
 
     def __str__(self):
         return self.title
@@ -107,14 +127,23 @@ class Article(models.Model):
             self.slug = unique_slugify(self, self.title)
         super().save(*args, **kwargs)
 
-        if self.__thumbnail != self.thumbnail and self.thumbnail:
-            image_compress(self.thumbnail.path, width=500, height=500)
-
     def get_sum_rating(self):
-        return sum([rating.value for rating in self.ratings.all()])
+        return self.stats.rating_sum
 
     def get_view_count(self):
-        return self.views.count()
+        return self.stats.view_count
+
+
+# Ключ рекомендательной блокировки PostgreSQL для выделения tree_id новых деревьев комментариев
+COMMENT_TREE_LOCK_ID = 7310001
+
+
+def lock_comment_tree_ids():
+    # django-mptt выдает новому корню tree_id = max + 1, как и массовый импорт (comment_import.py):
+    # без общей блокировки до конца транзакции два дерева получили бы один номер. SQLite сериализует запись сам
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [COMMENT_TREE_LOCK_ID])
 
 
 class Comment(MPTTModel):
@@ -128,7 +157,8 @@ class Comment(MPTTModel):
     article = models.ForeignKey(Article, on_delete=models.CASCADE, verbose_name='Статья', related_name='comments')
     author = models.ForeignKey(to=User, verbose_name='Автор комментария', on_delete=models.CASCADE, related_name='comments_author')
     content = models.TextField(verbose_name='Текст комментария', max_length=3000)
-    time_create = models.DateTimeField(verbose_name='Время добавления', auto_now_add=True)
+    # default вместо auto_now_add: при массовом импорте (comment_import.py) сохраняется исходное время
+    time_create = models.DateTimeField(verbose_name='Время добавления', default=timezone.now)
     time_update = models.DateTimeField(verbose_name='Время обновления', auto_now=True)
     status = models.CharField(choices=STATUS_OPTIONS, default='published', verbose_name='Статус поста', max_length=10)
     parent = TreeForeignKey('self', verbose_name='Родительский комментарий', null=True, blank=True, related_name='children', on_delete=models.CASCADE)
@@ -146,6 +176,13 @@ class Comment(MPTTModel):
     def __str__(self):
         return f'{self.author}:{self.content}'
 
+    def save(self, *args, **kwargs):
+        if self.pk is None and self.parent_id is None:
+            with transaction.atomic():
+                lock_comment_tree_ids()
+                return super().save(*args, **kwargs)
+        return super().save(*args, **kwargs)
+
 
 class Rating(models.Model):
     # Модель рейтинга: лайк, дизлайк
@@ -163,6 +200,11 @@ class Rating(models.Model):
         verbose_name = 'Рейтинг'
         verbose_name_plural = 'Рейтинги'
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Значение до изменения, нужно для пересчета счетчиков в ArticleStats
+        self.initial_value = self.value if self.pk else None
+
     def __str__(self):
         return self.article.title
 
@@ -170,13 +212,184 @@ class Rating(models.Model):
 class ViewCount(models.Model):
     article = models.ForeignKey('Article', on_delete=models.CASCADE, related_name='views')
     ip_address = models.GenericIPAddressField(verbose_name='IP адрес')
-    viewed_on = models.DateTimeField(auto_now_add=True, verbose_name='Дата просмотров')
+    viewed_on = models.DateTimeField(default=timezone.now, verbose_name='Дата просмотров')
+    # Отметка агрегации (rollups.py): строки с меньшим id могут стать видимыми позже строк с большим,
+    # поэтому учтенные строки отмечаются, а не отсекаются по наибольшему обработанному id
+    rolled_up = models.BooleanField(default=False, verbose_name='Учтен в суточных агрегатах')
 
     class Meta:
         ordering = ('-viewed_on',)
-        indexes = [models.Index(fields=['-viewed_on'])]
+        indexes = [
+            models.Index(fields=['-viewed_on']),
+            models.Index(fields=['id'], condition=Q(rolled_up=False), name='viewcount_pending_rollup'),
+        ]
+        constraints = [models.UniqueConstraint(fields=['article', 'ip_address'], name='unique_article_view')]
         verbose_name = 'Просмотр'
         verbose_name_plural = 'Просмотры'
 
     def __str__(self):
         return self.article.title
+
+
+class ArticleStats(models.Model):
+    # Денормализованные счетчики статьи: рейтинг, просмотры и комментарии.
+    # Обновляются сигналами (modules/blog/signals.py) через F-выражения, поэтому списки статей
+    # читают их одним JOIN, а не считают рейтинги и просмотры для каждой карточки.
+
+    class ArticleStatsManager(models.Manager):
+        def increment(self, article_id, **deltas):
+            # Атомарное изменение счетчиков: increment(article_id, view_count=1, rating_sum=-1)
+            deltas = {field: delta for field, delta in deltas.items() if delta}
+            if not deltas:
+                return
+            updated = self.filter(article_id=article_id).update(
+                **{field: F(field) + delta for field, delta in deltas.items()})
+            if not updated:
+                # Записи нет (например, статья загружена фикстурой) - считаем счетчики заново
+                self.refresh(article_id)
+
+        def refresh(self, article_id):
+            # Полный пересчет счетчиков статьи по исходным таблицам
+            ratings = Rating.objects.filter(article_id=article_id).aggregate(
+                rating_sum=Sum('value', default=0),
+                likes=Count('id', filter=Q(value=1)),
+                dislikes=Count('id', filter=Q(value=-1)),
+            )
+            stats, _ = self.update_or_create(article_id=article_id, defaults={
+                **ratings,
+                'view_count': ViewCount.objects.filter(article_id=article_id).count(),
+                'comment_count': Comment.objects.filter(article_id=article_id).count(),
+            })
+            return stats
+
+    article = models.OneToOneField(Article, verbose_name='Статья', on_delete=models.CASCADE,
+                                   primary_key=True, related_name='stats')
+    rating_sum = models.IntegerField(verbose_name='Сумма рейтинга', default=0)
+    likes = models.IntegerField(verbose_name='Нравится', default=0)
+    dislikes = models.IntegerField(verbose_name='Не нравится', default=0)
+    view_count = models.IntegerField(verbose_name='Просмотры', default=0)
+    comment_count = models.IntegerField(verbose_name='Комментарии', default=0)
+    objects = ArticleStatsManager()
+
+    class Meta:
+        db_table = 'app_article_stats'
+        verbose_name = 'Статистика статьи'
+        verbose_name_plural = 'Статистика статей'
+
+    def __str__(self):
+        return self.article.title
+
+
+class ArticleDailyViews(models.Model):
+    # Суточные агрегаты просмотров статей. Заполняются задачей rollup_daily_views_task
+    # по строкам ViewCount, еще не отмеченным rolled_up.
+
+    class ArticleDailyViewsManager(models.Manager):
+        def for_last_days(self, days):
+            # Агрегаты за последние days суток, включая текущие
+            start_day = timezone.localdate() - timedelta(days=days - 1)
+            return self.get_queryset().filter(day__gte=start_day)
+
+        def views_in_last_days(self, days):
+            # Количество просмотров по статьям за последние days суток, по убыванию
+            return (self.for_last_days(days).values('article_id')
+                    .annotate(total_views=Sum('views'), today_views=Sum('views', filter=Q(day=timezone.localdate())))
+                    .order_by('-total_views', '-today_views'))
+
+        def article_views(self, article_id, days):
+            # Количество просмотров одной статьи за последние days суток
+            return self.for_last_days(days).filter(article_id=article_id).aggregate(
+                total=Sum('views', default=0))['total']
+
+    article = models.ForeignKey(Article, verbose_name='Статья', on_delete=models.CASCADE, related_name='daily_views')
+    day = models.DateField(verbose_name='День')
+    views = models.IntegerField(verbose_name='Просмотры', default=0)
+    unique_ips = models.IntegerField(verbose_name='Уникальные IP', default=0)
+    objects = ArticleDailyViewsManager()
+
+    class Meta:
+        db_table = 'app_article_daily_views'
+        ordering = ('-day',)
+        indexes = [models.Index(fields=['day', 'article'])]
+        constraints = [models.UniqueConstraint(fields=['article', 'day'], name='unique_article_day_views')]
+        verbose_name = 'Просмотры за день'
+        verbose_name_plural = 'Просмотры по дням'
+
+    def __str__(self):
+        return f'{self.article}: {self.day}'
+
+
+class RollupWatermark(models.Model):
+    # Отметка последней обработанной строки для инкрементальных агрегатов
+    name = models.CharField(verbose_name='Название', max_length=100, unique=True)
+    last_id = models.BigIntegerField(verbose_name='Последний обработанный ID', default=0)
+    time_update = models.DateTimeField(verbose_name='Время обновления', auto_now=True)
+
+    class Meta:
+        db_table = 'app_rollup_watermarks'
+        verbose_name = 'Отметка агрегации'
+        verbose_name_plural = 'Отметки агрегации'
+
+    def __str__(self):
+        return f'{self.name}: {self.last_id}'
+
+
+class TagStats(models.Model):
+    # Количество опубликованных статей по тегу. Обновляется сигналами при изменении тегов статьи,
+    # ее публикации, снятии с публикации и удалении (modules/blog/signals.py).
+
+    class TagStatsManager(models.Manager):
+        CLOUD_CACHE_KEY = 'blog:tag_cloud'
+
+        def increment(self, tag_ids, delta):
+            tag_ids = list(tag_ids)
+            if not tag_ids or not delta:
+                return
+            self.bulk_create([self.model(tag_id=tag_id) for tag_id in tag_ids], ignore_conflicts=True)
+            self.filter(tag_id__in=tag_ids).update(published_count=F('published_count') + delta)
+            cache.delete(self.CLOUD_CACHE_KEY)
+            bump_generation('tag')
+
+        def cloud(self):
+            # Первые TAG_CLOUD_SIZE тегов по количеству опубликованных статей (кешируется до изменения счетчиков)
+            tag_list = cache.get(self.CLOUD_CACHE_KEY)
+            if tag_list is None:
+                tag_list = list(self.filter(published_count__gt=0).order_by('-published_count', 'tag__name')
+                                .values('published_count', name=F('tag__name'), slug=F('tag__slug'))
+                                [:settings.TAG_CLOUD_SIZE])
+                for tag in tag_list:
+                    tag['num_times'] = tag.pop('published_count')
+                cache.set(self.CLOUD_CACHE_KEY, tag_list, settings.TAG_CLOUD_CACHE_TIMEOUT)
+            return tag_list
+
+    tag = models.OneToOneField(Tag, verbose_name='Тег', on_delete=models.CASCADE, primary_key=True,
+                               related_name='stats')
+    published_count = models.IntegerField(verbose_name='Опубликованных статей', default=0, db_index=True)
+    objects = TagStatsManager()
+
+    class Meta:
+        db_table = 'app_tag_stats'
+        verbose_name = 'Статистика тега'
+        verbose_name_plural = 'Статистика тегов'
+
+    def __str__(self):
+        return f'{self.tag}: {self.published_count}'
+
+
+class SimilarArticle(models.Model):
+    # Предрасчитанные похожие статьи: первые SIMILAR_ARTICLES_STORED кандидатов по весу общих тегов
+    # и близости категорий. Обновляется задачей refresh_similar_articles_task (modules/blog/similarity.py).
+    article = models.ForeignKey(Article, verbose_name='Статья', on_delete=models.CASCADE, related_name='similar_entries')
+    similar = models.ForeignKey(Article, verbose_name='Похожая статья', on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField(verbose_name='Оценка сходства')
+
+    class Meta:
+        db_table = 'app_similar_articles'
+        ordering = ('-score',)
+        indexes = [models.Index(fields=['article', '-score'])]
+        constraints = [models.UniqueConstraint(fields=['article', 'similar'], name='unique_similar_article')]
+        verbose_name = 'Похожая статья'
+        verbose_name_plural = 'Похожие статьи'
+
+    def __str__(self):
+        return f'{self.article_id} -> {self.similar_id}: {self.score:.3f}'
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+from .models import ArticleDailyViews, RollupWatermark, ViewCount
+
+
+DAILY_VIEWS_WATERMARK = 'article_daily_views'
+
+
+def rollup_views_batch(batch_size):
+    """
+    Агрегация следующей пачки неучтенных ViewCount (rolled_up=False) с отметкой строк пачки.
+    Отметка по наибольшему id потеряла бы строки, зафиксированные позже строк с большим id.
+    Строка RollupWatermark служит блокировкой от параллельных запусков и хранит последний id для контроля.
+    Возвращает количество обработанных строк.
+    """
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=DAILY_VIEWS_WATERMARK)
+        batch_ids = list(ViewCount.objects.filter(rolled_up=False).order_by('id')
+                         .values_list('id', flat=True)[:batch_size])
+        if not batch_ids:
+            return 0
+
+        batch = ViewCount.objects.filter(id__in=batch_ids)
+        groups = (batch.annotate(day=TruncDate('viewed_on')).values('article_id', 'day')
+                  .annotate(views=Count('id'), unique_ips=Count('ip_address', distinct=True)).order_by())
+        groups = {(row['article_id'], row['day']): row for row in groups}
+
+        existing = ArticleDailyViews.objects.filter(
+            article_id__in={article_id for article_id, _ in groups},
+            day__in={day for _, day in groups},
+        )
+        existing = {(rollup.article_id, rollup.day): rollup for rollup in existing}
+
+        to_update, to_create = [], []
+        for key, row in groups.items():
+            rollup = existing.get(key)
+            if rollup is None:
+                to_create.append(ArticleDailyViews(article_id=row['article_id'], day=row['day'],
+                                                   views=row['views'], unique_ips=row['unique_ips']))
+            else:
+                # ViewCount уникален по (article, ip_address), поэтому уникальные IP разных пачек не пересекаются
+                rollup.views += row['views']
+                rollup.unique_ips += row['unique_ips']
+                to_update.append(rollup)
+        ArticleDailyViews.objects.bulk_create(to_create)
+        ArticleDailyViews.objects.bulk_update(to_update, ['views', 'unique_ips'])
+
+        processed = batch.update(rolled_up=True)
+        watermark.last_id = max(watermark.last_id, batch_ids[-1])
+        watermark.save(update_fields=['last_id', 'time_update'])
+    return processed
+
+
+def rollup_views(batch_size=None):
+    # Обработка всех новых просмотров пачками по VIEW_ROLLUP_BATCH_SIZE
+    batch_size = batch_size or settings.VIEW_ROLLUP_BATCH_SIZE
+    total = 0
+    while True:
+        processed = rollup_views_batch(batch_size)
+        total += processed
+        if not processed:
+            return total
+
+
+def reset_views_rollup():
+    # Удаление агрегатов и отметки для полного пересчета
+    with transaction.atomic():
+        ArticleDailyViews.objects.all().delete()
+        ViewCount.objects.filter(rolled_up=True).update(rolled_up=False)
+        RollupWatermark.objects.filter(name=DAILY_VIEWS_WATERMARK).delete()
@@ -0,0 +1,42 @@
+from functools import lru_cache
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    # Движок поиска задается настройкой SEARCH_BACKEND (путь к классу)
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+def search_articles(query):
+    return get_search_backend().search(query)
+
+
+def normalize_suggest_query(query):
+    return ' '.join(query.lower().split())[:settings.SEARCH_SUGGEST_MAX_LENGTH]
+
+
+def suggest(query):
+    # Подсказки по фрагменту запроса: заголовки опубликованных статей и теги.
+    # Популярные фрагменты повторяются часто, поэтому ответ кешируется на SEARCH_SUGGEST_CACHE_TIMEOUT секунд.
+    query = normalize_suggest_query(query)
+    if len(query) < settings.SEARCH_SUGGEST_MIN_LENGTH:
+        return {'articles': [], 'tags': []}
+    cache_key = f'search:suggest:{md5(query.encode()).hexdigest()}'
+    suggestions = cache.get(cache_key)
+    if suggestions is None:
+        found = get_search_backend().suggest(query, settings.SEARCH_SUGGEST_LIMIT)
+        suggestions = {
+            'articles': [{'title': article['title'],
+                          'url': reverse('articles_detail', kwargs={'slug': article['slug']})}
+                         for article in found['articles']],
+            'tags': [{'name': tag['name'], 'url': reverse('articles_by_tags', kwargs={'tag': tag['slug']})}
+                     for tag in found['tags']],
+        }
+        cache.set(cache_key, suggestions, settings.SEARCH_SUGGEST_CACHE_TIMEOUT)
+    return suggestions
@@ -0,0 +1,28 @@
+from django.db.models import FloatField, Value
+
+from ..models import Article
+
+
+class BaseSearchBackend:
+    """
+    Движок поиска статей. search() возвращает QuerySet опубликованных статей с аннотацией rank,
+    update() и remove() вызываются сигналами при сохранении и удалении статей.
+    """
+    def search(self, query):
+        raise NotImplementedError
+
+    def suggest(self, query, limit):
+        # {'articles': [{'title', 'slug'}], 'tags': [{'name', 'slug'}]}
+        raise NotImplementedError
+
+    def update(self, article_ids):
+        pass
+
+    def remove(self, article_ids):
+        pass
+
+    def rebuild(self, batch_size=500):
+        raise NotImplementedError
+
+    def empty(self):
+        return Article.objects.none().annotate(rank=Value(0, output_field=FloatField()))
@@ -0,0 +1,314 @@
+import fcntl
+import heapq
+import html
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, FloatField, Q, Value, When
+from taggit.models import Tag
+
+from .base import BaseSearchBackend
+from ..models import Article
+
+
+SNAPSHOT_VERSION = 1
+TITLE_WEIGHT = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+MIN_STEM_LENGTH = 3
+SUGGEST_PREFIX_TERMS = 20
+
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+TOKEN_RE = re.compile(r'\w+')
+# Окончания русских слов, от длинных к коротким: грубая замена стеммера snowball для движка без зависимостей
+RUSSIAN_ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ией', 'иях', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ешь', 'ишь', 'ость', 'ости',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ой', 'ей', 'ий', 'ый', 'ом', 'ем', 'ам', 'ям', 'ах', 'ях', 'ов', 'ев',
+    'ию', 'ью', 'ия', 'ья', 'ье', 'ую', 'юю', 'ть', 'ся', 'ет', 'ют', 'ит', 'ат', 'ят', 'им',
+    'а', 'я', 'о', 'е', 'и', 'ы', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+
+
+def stem(word):
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text):
+    # Текст без HTML-разметки -> список основ слов
+    text = html.unescape(HTML_TAG_RE.sub(' ', text or '')).lower().replace('ё', 'е')
+    return [stem(word) for word in TOKEN_RE.findall(text)]
+
+
+class InvertedIndex:
+    """
+    Инвертированный индекс с ранжированием BM25. Для каждого терма хранятся два массива одинаковой длины:
+    отсортированные id статей и частоты терма (заголовок учитывается с весом TITLE_WEIGHT).
+    """
+    def __init__(self):
+        self.postings = {}
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id, title, text):
+        self.remove(doc_id)
+        frequencies = Counter()
+        for term in tokenize(title):
+            frequencies[term] += TITLE_WEIGHT
+        frequencies.update(tokenize(text))
+        for term, frequency in frequencies.items():
+            doc_ids, doc_frequencies = self.postings.setdefault(term, (array('I'), array('I')))
+            if not doc_ids or doc_ids[-1] < doc_id:
+                # Обычный случай при построении по возрастанию id и для новых статей
+                doc_ids.append(doc_id)
+                doc_frequencies.append(frequency)
+                continue
+            position = bisect_left(doc_ids, doc_id)
+            doc_ids.insert(position, doc_id)
+            doc_frequencies.insert(position, frequency)
+        self.doc_terms[doc_id] = tuple(frequencies)
+        self.doc_lengths[doc_id] = sum(frequencies.values())
+        self.total_length += self.doc_lengths[doc_id]
+
+    def remove(self, doc_id):
+        for term in self.doc_terms.pop(doc_id, ()):
+            doc_ids, doc_frequencies = self.postings[term]
+            position = bisect_left(doc_ids, doc_id)
+            del doc_ids[position]
+            del doc_frequencies[position]
+            if not doc_ids:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+
+    def search(self, terms, limit):
+        # Статьи, содержащие все термы запроса: [(doc_id, score)] по убыванию оценки
+        terms = set(terms)
+        if not terms or any(term not in self.postings for term in terms):
+            return []
+        postings = sorted((self.postings[term] for term in terms), key=lambda posting: len(posting[0]))
+        total, average_length = len(self.doc_lengths), self.total_length / len(self.doc_lengths)
+
+        scores = {}
+        shortest_ids, _ = postings[0]
+        for doc_id in shortest_ids:
+            frequencies = []
+            for doc_ids, doc_frequencies in postings:
+                position = bisect_left(doc_ids, doc_id)
+                if position == len(doc_ids) or doc_ids[position] != doc_id:
+                    break
+                frequencies.append((len(doc_ids), doc_frequencies[position]))
+            else:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] = sum(
+                    math.log(1 + (total - df + 0.5) / (df + 0.5)) * tf * (BM25_K1 + 1) / (tf + norm)
+                    for df, tf in frequencies
+                )
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+
+    def prefix_search(self, terms, prefix, limit):
+        # Поиск с последним словом запроса как префиксом: по самым частым термам, начинающимся с prefix
+        expansions = heapq.nlargest(SUGGEST_PREFIX_TERMS, (term for term in self.postings if term.startswith(prefix)),
+                                    key=lambda term: len(self.postings[term][0]))
+        scores = {}
+        for term in expansions:
+            for doc_id, score in self.search([*terms, term], limit):
+                scores[doc_id] = max(score, scores.get(doc_id, 0))
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+
+    def save(self, path):
+        # Запись во временный файл и атомарная замена, чтобы другие процессы не прочитали половину снимка
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'wb') as snapshot:
+            pickle.dump((SNAPSHOT_VERSION, self.__dict__), snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path):
+        # None, если снимка нет или он записан другой версией индекса
+        try:
+            with open(path, 'rb') as snapshot:
+                version, state = pickle.load(snapshot)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        if version != SNAPSHOT_VERSION:
+            return None
+        index = cls()
+        index.__dict__.update(state)
+        return index
+
+
+class MemorySearchBackend(BaseSearchBackend):
+    """
+    Поиск без PostgreSQL: инвертированный индекс опубликованных статей в памяти процесса со снимком
+    на диске (SEARCH_INDEX_PATH). Для небольших установок, CI и офлайн-сравнения ранжирования.
+    Изменения статей дописываются в журнал рядом со снимком (O(изменения), а не O(корпус) на сохранение),
+    другие процессы применяют только новые записи журнала. Журнал длиннее SEARCH_INDEX_JOURNAL_LIMIT
+    записей сворачивается в новый снимок.
+    """
+    def __init__(self):
+        self.path = settings.SEARCH_INDEX_PATH
+        self.journal_path = f'{self.path}.journal'
+        self.lock = threading.RLock()
+        self._lock_file = None
+        self._index = None
+        self._snapshot_id = None
+        self._journal_offset = 0
+        self._journal_records = 0
+
+    @contextmanager
+    def file_lock(self, operation=fcntl.LOCK_EX):
+        # Блокировка потоков и flock на соседнем файле для других процессов: LOCK_SH - чтение снимка
+        # и журнала, LOCK_EX - запись. Повторный вход из того же потока (reindex -> rebuild) не блокируется
+        with self.lock:
+            if self._lock_file is not None:
+                yield
+                return
+            with open(f'{self.path}.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, operation)
+                self._lock_file = lock_file
+                try:
+                    yield
+                finally:
+                    self._lock_file = None
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def snapshot_id(self):
+        # Новый снимок записывается через os.replace, поэтому меняется inode
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def journal_size(self):
+        try:
+            return os.stat(self.journal_path).st_size
+        except OSError:
+            return 0
+
+    def replay_journal(self):
+        # Применение записей журнала после прочитанного места: ('add', id, title, text) или ('remove', id)
+        try:
+            journal = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            return
+        with journal:
+            journal.seek(self._journal_offset)
+            while True:
+                try:
+                    record = pickle.load(journal)
+                except (EOFError, pickle.UnpicklingError):
+                    break
+                if record[0] == 'add':
+                    self._index.add(*record[1:])
+                else:
+                    self._index.remove(record[1])
+                self._journal_offset = journal.tell()
+                self._journal_records += 1
+
+    def refresh(self):
+        # Актуализация индекса процесса: новый снимок - полная загрузка, иначе только новые записи журнала.
+        # False, если снимка еще нет
+        with self.file_lock(fcntl.LOCK_SH):
+            snapshot_id = self.snapshot_id()
+            if snapshot_id is None:
+                return False
+            if self._index is None or snapshot_id != self._snapshot_id or self.journal_size() < self._journal_offset:
+                index = InvertedIndex.load(self.path)
+                if index is None:
+                    return False
+                self._index, self._snapshot_id = index, snapshot_id
+                self._journal_offset = self._journal_records = 0
+            self.replay_journal()
+            return True
+
+    @property
+    def index(self):
+        with self.lock:
+            if not self.refresh():
+                self.rebuild()
+            return self._index
+
+    def save_snapshot(self):
+        # Снимок текущего индекса и пустой журнал (под LOCK_EX)
+        self._index.save(self.path)
+        open(self.journal_path, 'wb').close()
+        self._snapshot_id = self.snapshot_id()
+        self._journal_offset = self._journal_records = 0
+
+    def search(self, query):
+        results = self.index.search(tokenize(query), settings.SEARCH_MAX_RESULTS) if query else []
+        if not results:
+            return self.empty()
+        rank = Case(*[When(id=doc_id, then=Value(score)) for doc_id, score in results], output_field=FloatField())
+        return Article.objects.all().filter(id__in=[doc_id for doc_id, _ in results]).annotate(rank=rank)
+
+    def suggest(self, query, limit):
+        # Статьи по индексу (последнее слово - префикс), теги - выборкой в БД с ограничением limit.
+        # icontains в SQLite не учитывает регистр кириллицы, поэтому добавлены варианты "Слово" и "СЛОВО"
+        terms = tokenize(query)
+        results = self.index.prefix_search(terms[:-1], terms[-1], limit) if terms else []
+        articles = Article.objects.filter(status='published').in_bulk([doc_id for doc_id, _ in results])
+        query = query.lower()
+        tags = (Tag.objects.filter(stats__published_count__gt=0)
+                .filter(Q(name__icontains=query) | Q(name__contains=query.capitalize())
+                        | Q(name__contains=query.upper()))
+                .order_by('-stats__published_count').values('name', 'slug')[:limit])
+        return {
+            'articles': [{'title': articles[doc_id].title, 'slug': articles[doc_id].slug}
+                         for doc_id, _ in results if doc_id in articles],
+            'tags': list(tags),
+        }
+
+    def update(self, article_ids):
+        # Индекс меняется только после фиксации транзакции, иначе откат оставил бы в нем несуществующие данные
+        transaction.on_commit(lambda: self.reindex(article_ids))
+
+    def remove(self, article_ids):
+        transaction.on_commit(lambda: self.reindex(article_ids))
+
+    def reindex(self, article_ids):
+        # Опубликованные статьи переиндексируются, снятые с публикации и удаленные убираются из индекса.
+        # Под LOCK_EX индекс сначала догоняет журнал других процессов, затем изменения дописываются в журнал
+        with self.file_lock():
+            if not self.refresh():
+                self.rebuild()
+                return
+            articles = (Article.objects.filter(id__in=article_ids, status='published')
+                        .values_list('id', 'title', 'full_description'))
+            records = [('add', *article) for article in articles]
+            published = {record[1] for record in records}
+            records += [('remove', article_id) for article_id in set(article_ids) - published]
+            with open(self.journal_path, 'ab') as journal:
+                for record in records:
+                    pickle.dump(record, journal, protocol=pickle.HIGHEST_PROTOCOL)
+            self.replay_journal()
+            if self._journal_records >= settings.SEARCH_INDEX_JOURNAL_LIMIT:
+                self.save_snapshot()
+
+    def rebuild(self, batch_size=500):
+        # Статьи по возрастанию id: термы дописываются в конец массивов, без вставки в середину
+        index = InvertedIndex()
+        articles = (Article.objects.filter(status='published').order_by('id')
+                    .values_list('id', 'title', 'full_description'))
+        for article_id, title, full_description in articles.iterator(chunk_size=batch_size):
+            index.add(article_id, title, full_description)
+        with self.file_lock():
+            self._index = index
+            self.save_snapshot()
+        return len(index)
@@ -0,0 +1,57 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db.models import DecimalField, F, Func, TextField, Value
+from django.db.models.functions import Cast
+from taggit.models import Tag
+
+from .base import BaseSearchBackend
+from ..models import Article
+
+
+SEARCH_CONFIG = 'russian'
+
+
+def strip_html(field):
+    # Удаление HTML-разметки CKEditor на стороне БД перед построением вектора
+    return Func(F(field), Value('<[^>]+>'), Value(' '), Value('g'), function='regexp_replace',
+                output_field=TextField())
+
+
+def search_vector_expression():
+    return (SearchVector(F('title'), weight='A', config=SEARCH_CONFIG)
+            + SearchVector(strip_html('full_description'), weight='B', config=SEARCH_CONFIG))
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    # Полнотекстовый поиск PostgreSQL по сохраненному вектору (GIN-индекс), подсказки по триграммам
+    def search(self, query):
+        if not query:
+            return self.empty()
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        # ts_rank возвращает float4: после передачи в курсор пагинации через текст значение не совпадает
+        # с пересчитанным в БД, поэтому ранг округляется до numeric, который сравнивается точно
+        rank = Cast(SearchRank(F('search_vector'), search_query), DecimalField(max_digits=20, decimal_places=12))
+        return Article.objects.all().filter(search_vector=search_query).annotate(rank=rank)
+
+    def suggest(self, query, limit):
+        articles = (Article.objects.filter(status='published', title__trigram_word_similar=query)
+                    .annotate(similarity=TrigramWordSimilarity(query, 'title'))
+                    .order_by('-similarity', '-time_create').values('title', 'slug')[:limit])
+        tags = (Tag.objects.filter(name__trigram_word_similar=query, stats__published_count__gt=0)
+                .annotate(similarity=TrigramWordSimilarity(query, 'name'))
+                .order_by('-similarity', '-stats__published_count').values('name', 'slug')[:limit])
+        return {'articles': list(articles), 'tags': list(tags)}
+
+    def update(self, article_ids):
+        # Пересчет сохраненного поискового вектора одним UPDATE
+        Article.objects.filter(id__in=article_ids).update(search_vector=search_vector_expression())
+
+    def rebuild(self, batch_size=500):
+        # Пересчет векторов всех статей пачками по диапазонам id
+        last_id, total = 0, 0
+        while True:
+            ids = list(Article.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return total
+            self.update(ids)
+            total += len(ids)
+            last_id = ids[-1]
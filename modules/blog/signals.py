@@ -0,0 +1,352 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from django_cleanup.signals import cleanup_post_delete
+from taggit.models import Tag
+
+from .models import Article, ArticleStats, Category, Comment, Rating, ViewCount, TagStats, SimilarArticle
+from .comments import invalidate_comment_threads
+from .feeds import invalidate_feeds_on_commit
+from .search import get_search_backend
+from .sitemaps import mark_dirty
+from .tasks import refresh_similar_articles_task
+from modules.services.cache import bump_generation
+from modules.services.images import delete_image_variants, image_changed, image_variants_ready
+from modules.services.page_cache import purge_pages_on_commit, purge_surrogate_keys
+from modules.services.tasks import generate_image_variants_task
+from modules.system.models import Profile
+
+
+def deleted_with_article(origin):
+    # Удаление каскадом вместе со статьей: счетчики удаляются вместе с ней, пересчитывать нечего
+    return isinstance(origin, Article) or getattr(origin, 'model', None) is Article
+
+
+def rating_deltas(value, sign=1):
+    # Изменение счетчиков статьи при добавлении (sign=1) или удалении (sign=-1) оценки
+    return {
+        'rating_sum': sign * value,
+        'likes': sign * (value == 1),
+        'dislikes': sign * (value == -1),
+    }
+
+
+@receiver(post_save, sender=Article)
+def create_article_stats(sender, instance, created, **kwargs):
+    if created:
+        ArticleStats.objects.get_or_create(article=instance)
+
+
+@receiver(post_save, sender=Article)
+def update_search_index(sender, instance, **kwargs):
+    # Поисковый индекс статьи (вектор в PostgreSQL или инвертированный индекс в памяти) обновляет движок поиска
+    get_search_backend().update([instance.pk])
+
+
+@receiver(post_delete, sender=Article)
+def remove_from_search_index(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=Article)
+def update_tag_stats_on_status_change(sender, instance, created, **kwargs):
+    # Публикация статьи или снятие с публикации меняет счетчики всех ее тегов
+    if not created and instance.initial_status != instance.status:
+        if 'published' in (instance.initial_status, instance.status):
+            delta = 1 if instance.status == 'published' else -1
+            TagStats.objects.increment(instance.tags.values_list('id', flat=True), delta)
+
+
+@receiver(pre_delete, sender=Article)
+def update_tag_stats_on_article_delete(sender, instance, **kwargs):
+    if instance.status == 'published':
+        TagStats.objects.increment(instance.tags.values_list('id', flat=True), -1)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def update_tag_stats_on_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # Изменение набора тегов статьи (taggit отправляет m2m_changed только со стороны статьи)
+    if reverse or not isinstance(instance, Article):
+        return
+    if action == 'pre_clear':
+        instance.cleared_tag_ids = list(instance.tags.values_list('id', flat=True))
+        return
+    if instance.status != 'published':
+        return
+    if action == 'post_add':
+        TagStats.objects.increment(pk_set, 1)
+    elif action == 'post_remove':
+        TagStats.objects.increment(pk_set, -1)
+    elif action == 'post_clear':
+        TagStats.objects.increment(getattr(instance, 'cleared_tag_ids', []), -1)
+
+
+@receiver(post_save, sender=Rating)
+def update_stats_on_rating_save(sender, instance, created, **kwargs):
+    deltas = rating_deltas(instance.value)
+    if not created:
+        if instance.initial_value == instance.value:
+            return
+        for field, delta in rating_deltas(instance.initial_value, sign=-1).items():
+            deltas[field] += delta
+    ArticleStats.objects.increment(instance.article_id, **deltas)
+    instance.initial_value = instance.value
+
+
+@receiver(post_delete, sender=Rating)
+def update_stats_on_rating_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with_article(origin):
+        return
+    ArticleStats.objects.increment(instance.article_id, **rating_deltas(instance.value, sign=-1))
+
+
+@receiver(post_save, sender=ViewCount)
+def update_stats_on_view_save(sender, instance, created, **kwargs):
+    if created:
+        ArticleStats.objects.increment(instance.article_id, view_count=1)
+
+
+@receiver(post_delete, sender=ViewCount)
+def update_stats_on_view_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with_article(origin):
+        return
+    ArticleStats.objects.increment(instance.article_id, view_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def update_stats_on_comment_save(sender, instance, created, **kwargs):
+    if created:
+        ArticleStats.objects.increment(instance.article_id, comment_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def update_stats_on_comment_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with_article(origin):
+        return
+    ArticleStats.objects.increment(instance.article_id, comment_count=-1)
+
+
+# Смена поколений для кеша фрагментов шаблонов (сайдбар)
+@receiver([post_save, post_delete], sender=Category)
+def bump_category_generation(sender, **kwargs):
+    bump_generation('category')
+
+
+@receiver([post_save, post_delete], sender=Article)
+def bump_article_generation(sender, **kwargs):
+    bump_generation('article')
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def bump_comment_generation(sender, **kwargs):
+    bump_generation('comment')
+
+
+@receiver([post_save, post_delete], sender=Rating)
+def bump_rating_generation(sender, **kwargs):
+    # Рейтинг выводится в карточках списков статей (ETag списков)
+    bump_generation('rating')
+
+
+@receiver([post_save, post_delete], sender=ViewCount)
+def bump_views_generation(sender, **kwargs):
+    # Просмотры выводятся в карточках списков статей (ETag списков)
+    bump_generation('views')
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment_thread(sender, instance, **kwargs):
+    invalidate_comment_threads([instance.article_id])
+
+
+def invalidate_profile_comment_threads(profile):
+    # Аватар и ссылка на профиль выводятся в кешированных ветках всех статей, где пользователь комментировал
+    article_ids = Comment.objects.filter(author_id=profile.user_id).values_list('article_id', flat=True).distinct()
+    invalidate_comment_threads(list(article_ids))
+
+
+@receiver(post_save, sender=Profile)
+def invalidate_comment_threads_on_profile_change(sender, instance, created, raw=False, **kwargs):
+    # Профиль сохраняется при каждом сохранении пользователя (в том числе при входе): ветки сбрасываются,
+    # только если изменился аватар или адрес профиля. initial_avatar обновляет generate_avatar_variants
+    if not created and not raw and (instance.avatar.name != instance.initial_avatar
+                                    or instance.slug != instance.initial_slug):
+        invalidate_profile_comment_threads(instance)
+    instance.initial_slug = instance.slug
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def bump_tag_generation(sender, **kwargs):
+    bump_generation('tag')
+
+
+# Обновление индекса похожих статей (после фиксации транзакции, в Celery)
+def schedule_similar_refresh(article_id):
+    transaction.on_commit(lambda: refresh_similar_articles_task.delay(article_id))
+
+
+@receiver(post_save, sender=Article)
+def refresh_similar_on_article_save(sender, instance, created, raw=False, **kwargs):
+    # Соседей меняют только статус и категория, изменения тегов обрабатывает refresh_similar_on_tags_change
+    if not raw and (created or instance.status != instance.initial_status
+                    or instance.category_id != instance.initial_category_id):
+        schedule_similar_refresh(instance.id)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def refresh_similar_on_tags_change(sender, instance, action, reverse, **kwargs):
+    if not reverse and isinstance(instance, Article) and action in ('post_add', 'post_remove', 'post_clear'):
+        schedule_similar_refresh(instance.id)
+
+
+@receiver(pre_delete, sender=Article)
+def refresh_similar_on_article_delete(sender, instance, **kwargs):
+    # Записи о статье удалятся каскадом, соседям нужно заполнить освободившиеся места
+    for neighbour_id in SimilarArticle.objects.filter(similar=instance).values_list('article_id', flat=True):
+        schedule_similar_refresh(neighbour_id)
+
+
+# Кеш страниц для анонимных посетителей и кеш лент: сбрасываются только записи, в которые входит статья
+def purge_article_caches(article):
+    # Страница статьи, главная, категории статьи (прежняя и новая) с предками, ее теги и лента автора
+    category_ids = {article.category_id, article.initial_category_id} - {None}
+    categories = list(Category.objects.get_queryset_ancestors(Category.objects.filter(id__in=category_ids),
+                                                               include_self=True).values_list('id', 'slug'))
+    tag_slugs = list(article.tags.values_list('slug', flat=True))
+    author_slug = Profile.objects.filter(user_id=article.author_id).values_list('slug', flat=True).first()
+    purge_pages_on_commit(
+        f'article:{article.id}', 'home',
+        *(f'category:{category_id}' for category_id, _ in categories),
+        *(f'tag:{slug}' for slug in tag_slugs),
+    )
+    invalidate_feeds_on_commit(
+        ('latest', None), ('author', author_slug),
+        *(('category', slug) for _, slug in categories),
+        *(('tag', slug) for slug in tag_slugs),
+    )
+
+
+@receiver(post_save, sender=Article)
+def purge_caches_on_article_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        purge_article_caches(instance)
+    # Состояние до изменения прочитано всеми обработчиками выше (счетчики тегов, похожие статьи, кеш)
+    instance.initial_status = instance.status
+    instance.initial_category_id = instance.category_id
+
+
+@receiver(pre_delete, sender=Article)
+def purge_caches_on_article_delete(sender, instance, **kwargs):
+    # Теги и категории читаются до удаления статьи
+    purge_article_caches(instance)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def purge_caches_on_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse or not isinstance(instance, Article):
+        return
+    if action in ('post_add', 'post_remove'):
+        tag_ids = pk_set
+    elif action == 'post_clear':
+        tag_ids = getattr(instance, 'cleared_tag_ids', [])
+    else:
+        return
+    tag_slugs = list(Tag.objects.filter(id__in=tag_ids).values_list('slug', flat=True))
+    purge_pages_on_commit(f'article:{instance.id}', *(f'tag:{slug}' for slug in tag_slugs))
+    invalidate_feeds_on_commit(*(('tag', slug) for slug in tag_slugs))
+
+
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=Rating)
+def purge_pages_on_article_feedback(sender, instance, origin=None, **kwargs):
+    # Комментарии и рейтинг выводятся на странице статьи и в списках, где она есть
+    if not deleted_with_article(origin):
+        purge_pages_on_commit(f'article:{instance.article_id}')
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Tag)
+def purge_pages_on_sidebar_change(sender, **kwargs):
+    # Дерево категорий и облако тегов выводятся в сайдбаре каждой кешированной страницы
+    purge_pages_on_commit('sidebar')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+def invalidate_feeds_on_title_change(sender, instance, **kwargs):
+    # Название категории или тега - заголовок их ленты
+    invalidate_feeds_on_commit(('category' if sender is Category else 'tag', instance.slug))
+
+
+# Отметка частей sitemap, которые нужно перестроить (modules/blog/sitemaps.py)
+@receiver(post_save, sender=Article)
+def mark_sitemap_on_article_save(sender, instance, raw=False, **kwargs):
+    # Публикация и снятие с публикации меняют и список тегов со статьями
+    if not raw:
+        mark_dirty('articles', [instance.id])
+        mark_dirty('tags', instance.tags.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Article)
+def mark_sitemap_on_article_delete(sender, instance, **kwargs):
+    mark_dirty('articles', [instance.id])
+    mark_dirty('tags', instance.tags.values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def mark_sitemap_on_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse or not isinstance(instance, Article):
+        return
+    if action in ('post_add', 'post_remove'):
+        mark_dirty('tags', pk_set)
+    elif action == 'post_clear':
+        mark_dirty('tags', getattr(instance, 'cleared_tag_ids', []))
+
+
+@receiver([post_save, post_delete], sender=Category)
+def mark_sitemap_on_category_change(sender, instance, **kwargs):
+    mark_dirty('categories', [instance.id])
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def mark_sitemap_on_tag_change(sender, instance, **kwargs):
+    mark_dirty('tags', [instance.id])
+
+
+# Варианты размеров загруженных изображений (Celery) и сброс кеша HTML, где выводится изображение
+def schedule_image_variants(instance, field_name):
+    label, pk = instance._meta.label, instance.pk
+    transaction.on_commit(lambda: generate_image_variants_task.delay(label, pk, field_name))
+
+
+@receiver(post_save, sender=Article)
+def generate_thumbnail_variants(sender, instance, raw=False, **kwargs):
+    if not raw and image_changed(instance.thumbnail, instance.initial_thumbnail):
+        schedule_image_variants(instance, 'thumbnail')
+    instance.initial_thumbnail = instance.thumbnail.name
+
+
+@receiver(post_save, sender=Profile)
+def generate_avatar_variants(sender, instance, raw=False, **kwargs):
+    if not raw and image_changed(instance.avatar, instance.initial_avatar):
+        schedule_image_variants(instance, 'avatar')
+    instance.initial_avatar = instance.avatar.name
+
+
+@receiver(image_variants_ready, sender=Article)
+def purge_pages_on_thumbnail_variants(sender, instance, **kwargs):
+    purge_surrogate_keys(f'article:{instance.id}')
+
+
+@receiver(image_variants_ready, sender=Profile)
+def invalidate_comment_threads_on_avatar_variants(sender, instance, **kwargs):
+    invalidate_profile_comment_threads(instance)
+
+
+@receiver(cleanup_post_delete)
+def delete_image_variants_on_cleanup(sender, file_name, field_name, success, **kwargs):
+    # django_cleanup удалил замененное или осиротевшее изображение - удаляем и его варианты
+    if success and field_name in settings.IMAGE_VARIANT_WIDTHS:
+        delete_image_variants(file_name, field_name)
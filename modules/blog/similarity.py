@@ -0,0 +1,116 @@
+import math
+import random
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+
+from .models import Article, SimilarArticle, TagStats
+
+
+def get_tag_weights(tag_ids):
+    # Редкие теги весят больше: 1 / ln(e + количество опубликованных статей с тегом)
+    counts = dict(TagStats.objects.filter(tag_id__in=tag_ids).values_list('tag_id', 'published_count'))
+    return {tag_id: 1 / math.log(math.e + counts.get(tag_id, 0)) for tag_id in tag_ids}
+
+
+def compute_similar(article):
+    # Оценки всех кандидатов с общими тегами: {article_id: score}. Оценка симметрична для пары статей.
+    if article.status != 'published':
+        return {}
+    tag_ids = list(article.tags.values_list('id', flat=True))
+    if not tag_ids:
+        return {}
+    weights = get_tag_weights(tag_ids)
+    rows = (Article.objects.filter(status='published', tags__in=tag_ids).exclude(id=article.id)
+            .values_list('id', 'category_id', 'category__tree_id', 'tags__id'))
+
+    scores = defaultdict(float)
+    categories = {}
+    for candidate_id, category_id, tree_id, tag_id in rows:
+        scores[candidate_id] += weights[tag_id]
+        categories[candidate_id] = (category_id, tree_id)
+    for candidate_id, (category_id, tree_id) in categories.items():
+        if category_id == article.category_id:
+            scores[candidate_id] += settings.SIMILAR_ARTICLES_CATEGORY_WEIGHT
+        elif tree_id == article.category.tree_id:
+            scores[candidate_id] += settings.SIMILAR_ARTICLES_TREE_WEIGHT
+    return scores
+
+
+def top_scores(scores):
+    # Лучшие кандидаты, при равной оценке - более новые статьи
+    ranked = sorted(scores.items(), key=lambda item: (item[1], item[0]), reverse=True)
+    return ranked[:settings.SIMILAR_ARTICLES_STORED]
+
+
+def store_similar(article_id, scores):
+    SimilarArticle.objects.filter(article_id=article_id).delete()
+    SimilarArticle.objects.bulk_create([
+        SimilarArticle(article_id=article_id, similar_id=similar_id, score=score)
+        for similar_id, score in top_scores(scores)
+    ])
+
+
+def trim_similar(article_ids):
+    # Оставляем у статей не больше SIMILAR_ARTICLES_STORED записей
+    for article_id in article_ids:
+        extra = (SimilarArticle.objects.filter(article_id=article_id).order_by('-score', '-similar_id')
+                 .values_list('id', flat=True)[settings.SIMILAR_ARTICLES_STORED:])
+        SimilarArticle.objects.filter(id__in=list(extra)).delete()
+
+
+def refresh_similar_articles(article_id):
+    # Инкрементальное обновление после изменения тегов, категории или статуса статьи:
+    # пересчет ее списка и точечное обновление списков соседей (оценка пары симметрична).
+    article = Article.objects.select_related('category').filter(id=article_id).first()
+    scores = compute_similar(article) if article else {}
+    limit = settings.SIMILAR_ARTICLES_STORED
+
+    with transaction.atomic():
+        if article:
+            store_similar(article_id, scores)
+
+        # Соседи, у которых статья больше не должна быть в списке, пересчитываются полностью,
+        # чтобы освободившееся место занял следующий кандидат
+        listed_in = set(SimilarArticle.objects.filter(similar_id=article_id).values_list('article_id', flat=True))
+        stale = listed_in - set(scores)
+        SimilarArticle.objects.filter(similar_id=article_id, article_id__in=stale).delete()
+
+        # Соседям обновляем оценку пары, если она уже в списке, и добавляем пару,
+        # только если она проходит в их первые SIMILAR_ARTICLES_STORED
+        current = {row['article_id']: row for row in SimilarArticle.objects.filter(article_id__in=list(scores))
+                   .values('article_id').annotate(total=Count('id'), min_score=Min('score')).order_by()}
+        updates = []
+        for neighbour_id, score in scores.items():
+            row = current.get(neighbour_id)
+            if neighbour_id in listed_in or row is None or row['total'] < limit or score > row['min_score']:
+                updates.append(SimilarArticle(article_id=neighbour_id, similar_id=article_id, score=score))
+        SimilarArticle.objects.bulk_create(updates, update_conflicts=True,
+                                           unique_fields=['article', 'similar'], update_fields=['score'])
+        trim_similar(similar.article_id for similar in updates if similar.article_id not in listed_in)
+
+    for neighbour in Article.objects.select_related('category').filter(id__in=stale):
+        with transaction.atomic():
+            store_similar(neighbour.id, compute_similar(neighbour))
+
+
+def rebuild_similar_articles():
+    # Полный пересчет индекса похожих статей
+    total = 0
+    for article in Article.objects.select_related('category').filter(status='published').iterator():
+        with transaction.atomic():
+            store_similar(article.id, compute_similar(article))
+        total += 1
+    SimilarArticle.objects.exclude(article__status='published').delete()
+    return total
+
+
+def get_similar_articles(article, count):
+    # Случайные count статей из сохраненных кандидатов, одна выборка статей
+    similar_ids = list(SimilarArticle.objects.filter(article=article).values_list('similar_id', flat=True))
+    chosen_ids = random.sample(similar_ids, min(count, len(similar_ids)))
+    articles = Article.objects.filter(status='published').in_bulk(chosen_ids)
+    return [articles[similar_id] for similar_id in chosen_ids if similar_id in articles]
+
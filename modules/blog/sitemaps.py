@@ -1,26 +1,175 @@
-from django.contrib.sitemaps import Sitemap
+import filecmp
+import os
+import re
+from datetime import datetime, timezone
+from itertools import groupby
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.db import transaction
 from django.urls import reverse
+from django.views.static import serve
+from taggit.models import Tag
+
+from .models import Article, Category
+from modules.services.redis_client import get_redis_connection
+
+
+DIRTY_SHARDS_KEY = 'sitemap:dirty'
+INDEX_NAME = 'sitemap.xml'
+SHARD_NAME_RE = re.compile(r'^sitemap-(?P<section>[a-z]+)-(?P<number>\d+)\.xml$')
+URLSET_OPEN = '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = '</urlset>\n'
+
+# Разделы sitemap: выборка, поля узкой проекции и построение (адрес, время изменения) из значений полей
+SECTIONS = {
+    'articles': (lambda: Article.objects.filter(status='published'), ('slug', 'time_update'),
+                 lambda slug, time_update: (reverse('articles_detail', kwargs={'slug': slug}), time_update)),
+    'categories': (lambda: Category.objects.all(), ('slug',),
+                   lambda slug: (reverse('articles_by_category', kwargs={'slug': slug}), None)),
+    'tags': (lambda: Tag.objects.filter(stats__published_count__gt=0), ('slug',),
+             lambda slug: (reverse('articles_by_tags', kwargs={'tag': slug}), None)),
+}
+STATIC_PAGES = ('home', 'feedback')
+
+
+def shard_number(object_id):
+    # Часть sitemap определяется диапазоном id, поэтому изменение объекта затрагивает ровно одну часть
+    return object_id // settings.SITEMAP_SHARD_SIZE
+
+
+def shard_name(section, number):
+    return f'sitemap-{section}-{number}.xml'
+
+
+def shard_sort_key(name):
+    match = SHARD_NAME_RE.match(name)
+    return match['section'], int(match['number'])
+
+
+def mark_dirty(section, object_ids):
+    # Части sitemap с измененными объектами перестраиваются задачей regenerate_sitemaps_task
+    shards = {f'{section}:{shard_number(object_id)}' for object_id in object_ids}
+    if shards:
+        transaction.on_commit(lambda: get_redis_connection().sadd(DIRTY_SHARDS_KEY, *shards))
+
+
+def pop_dirty_shards():
+    pipeline = get_redis_connection().pipeline()
+    pipeline.smembers(DIRTY_SHARDS_KEY)
+    pipeline.delete(DIRTY_SHARDS_KEY)
+    shards, _ = pipeline.execute()
+    return sorted((section, int(number)) for section, number in (shard.decode().split(':') for shard in shards))
+
+
+def site_url():
+    return f'{settings.SITEMAP_PROTOCOL}://{Site.objects.get_current().domain}'
+
+
+def format_lastmod(value):
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def section_rows(section, number=None):
+    # (id, адрес, время изменения) объектов раздела по возрастанию id, потоком без загрузки моделей
+    queryset_factory, fields, build = SECTIONS[section]
+    queryset = queryset_factory().order_by('id')
+    if number is not None:
+        size = settings.SITEMAP_SHARD_SIZE
+        queryset = queryset.filter(id__gte=number * size, id__lt=(number + 1) * size)
+    for object_id, *values in queryset.values_list('id', *fields).iterator(chunk_size=settings.SITEMAP_CHUNK_SIZE):
+        yield object_id, *build(*values)
+
+
+def write_file(name, chunks):
+    # Запись во временный файл и атомарная замена. Неизмененный файл не переписывается, чтобы сохранить
+    # его время изменения (lastmod в индексе). Возвращает False, если записывать было нечего.
+    path = os.path.join(settings.SITEMAP_ROOT, name)
+    temporary_path = f'{path}.tmp'
+    written = False
+    with open(temporary_path, 'w', encoding='utf-8') as output:
+        for chunk in chunks:
+            output.write(chunk)
+            written = True
+    if not written:
+        os.remove(temporary_path)
+        if os.path.exists(path):
+            os.remove(path)
+    elif os.path.exists(path) and filecmp.cmp(temporary_path, path, shallow=False):
+        os.remove(temporary_path)
+    else:
+        os.replace(temporary_path, path)
+    return written
+
+
+def urlset(base_url, rows):
+    # XML части sitemap; пустая часть не дает ни одной строки
+    opened = False
+    for _, location, lastmod in rows:
+        if not opened:
+            yield URLSET_OPEN
+            opened = True
+        lastmod = f'<lastmod>{format_lastmod(lastmod)}</lastmod>' if lastmod else ''
+        yield f'<url><loc>{escape(base_url + location)}</loc>{lastmod}</url>\n'
+    if opened:
+        yield URLSET_CLOSE
 
-from .models import Article
 
+def write_index(base_url):
+    # Индекс из уже записанных частей, lastmod - время изменения файла части
+    names = sorted((name for name in os.listdir(settings.SITEMAP_ROOT) if SHARD_NAME_RE.match(name)),
+                   key=shard_sort_key)
+    entries = []
+    for name in names:
+        mtime = datetime.fromtimestamp(os.stat(os.path.join(settings.SITEMAP_ROOT, name)).st_mtime, tz=timezone.utc)
+        entries.append(f'<sitemap><loc>{escape(f"{base_url}/{name}")}</loc>'
+                       f'<lastmod>{format_lastmod(mtime)}</lastmod></sitemap>\n')
+    write_file(INDEX_NAME, [
+        '<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n',
+        *entries,
+        '</sitemapindex>\n',
+    ])
+    return len(names)
 
-class ArticleSitemap(Sitemap):
-    # Sitemap для статей
-    changefreq = 'monthly'
-    priority = 0.9
-    protocol = 'https'
 
-    def items(self):
-        return Article.objects.all()
+def build_sitemaps():
+    """
+    Полная генерация sitemap: каждый раздел читается одним потоком по возрастанию id и раскладывается
+    по частям фиксированного диапазона id (SITEMAP_SHARD_SIZE). Части без объектов удаляются.
+    Возвращает количество частей в индексе.
+    """
+    os.makedirs(settings.SITEMAP_ROOT, exist_ok=True)
+    # Изменения, сделанные во время генерации, снова отметят свои части
+    get_redis_connection().delete(DIRTY_SHARDS_KEY)
+    base_url = site_url()
+    written = {shard_name('static', 0)}
+    write_file(shard_name('static', 0), urlset(base_url, ((None, reverse(name), None) for name in STATIC_PAGES)))
+    for section in SECTIONS:
+        for number, rows in groupby(section_rows(section), key=lambda row: shard_number(row[0])):
+            write_file(shard_name(section, number), urlset(base_url, rows))
+            written.add(shard_name(section, number))
+    for name in os.listdir(settings.SITEMAP_ROOT):
+        if SHARD_NAME_RE.match(name) and name not in written:
+            os.remove(os.path.join(settings.SITEMAP_ROOT, name))
+    return write_index(base_url)
 
-    def lastmod(self, obj):
-        return obj.time_update
 
+def regenerate_sitemaps():
+    # Перестроение только отмеченных частей; без индекса (первый запуск) - полная генерация.
+    # Возвращает количество перестроенных частей
+    if not os.path.exists(os.path.join(settings.SITEMAP_ROOT, INDEX_NAME)):
+        return build_sitemaps()
+    shards = pop_dirty_shards()
+    if shards:
+        base_url = site_url()
+        for section, number in shards:
+            write_file(shard_name(section, number), urlset(base_url, section_rows(section, number)))
+        write_index(base_url)
+    return len(shards)
 
-class StaticSitemap(Sitemap):
-    # Sitemap для статичных страниц
-    def items(self):
-        return ['feedback', 'home']
 
-    def location(self, item):
-        return reverse(item)
+def sitemap_file(request, name):
+    # В production файлы отдает веб-сервер из SITEMAP_ROOT, представление - для разработки.
+    # serve() отвечает 304 по If-Modified-Since, запросов к БД нет.
+    return serve(request, name, document_root=settings.SITEMAP_ROOT)
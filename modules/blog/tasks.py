@@ -0,0 +1,37 @@
+from celery import shared_task
+
+from .leaderboard import rebuild_leaderboards
+from .rollups import rollup_views
+from .similarity import refresh_similar_articles
+from .sitemaps import regenerate_sitemaps
+from .tracking import flush_view_buffer
+
+
+@shared_task
+def flush_view_buffer_task():
+    # Перенос буферизованных просмотров статей из Redis в БД (CELERY_BEAT_SCHEDULE)
+    return flush_view_buffer()
+
+
+@shared_task
+def rollup_daily_views_task():
+    # Инкрементальное обновление суточных агрегатов просмотров (CELERY_BEAT_SCHEDULE)
+    return rollup_views()
+
+
+@shared_task
+def rebuild_leaderboards_task():
+    # Пересчет популярных статей за 24 часа, 7 и 30 дней (CELERY_BEAT_SCHEDULE)
+    rebuild_leaderboards()
+
+
+@shared_task
+def refresh_similar_articles_task(article_id):
+    # Обновление похожих статей после изменения тегов, категории или статуса статьи (modules/blog/signals.py)
+    refresh_similar_articles(article_id)
+
+
+@shared_task
+def regenerate_sitemaps_task():
+    # Перестроение частей sitemap с измененными статьями, категориями и тегами (CELERY_BEAT_SCHEDULE)
+    return regenerate_sitemaps()
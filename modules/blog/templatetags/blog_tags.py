@@ -1,40 +1,88 @@
-from datetime import datetime, date, time, timedelta
-from django.utils import timezone
 from django import template
-from django.db.models import Count, Q
-from taggit.models import Tag
+from django.utils.safestring import mark_safe
 
-from ..models import Comment, Article
+from ..comments import get_comment_page
+from ..leaderboard import get_popular_articles
+from ..models import Comment, TagStats
+from modules.services.cache import get_fragments, store_fragment
+from modules.services.utils import get_time_since
 
 register = template.Library()
 
-# Вывод тегов, с сортировкой по кол-ву статей, которые используют этот тег
+
+class FragmentCacheNode(template.Node):
+    # siblings - все фрагменты того же шаблона: первый выведенный читает их из кеша одним запросом
+    def __init__(self, nodelist, name, groups, siblings):
+        self.nodelist = nodelist
+        self.name = name
+        self.groups = groups
+        self.siblings = siblings
+
+    def resolve(self, context):
+        return self.name.resolve(context), [group.resolve(context) for group in self.groups]
+
+    def render(self, context):
+        name, groups = self.resolve(context)
+        fragments = context.render_context.get(self.siblings)
+        if fragments is None or name not in fragments:
+            fragments = get_fragments(dict(node.resolve(context) for node in self.siblings))
+            context.render_context[self.siblings] = fragments
+        version, html = fragments.pop(name)
+        if html is None:
+            html = self.nodelist.render(context)
+            store_fragment(name, version, html)
+        return html
+
+
+class FragmentSiblings(list):
+    # Список фрагментов шаблона; ключ render_context сравнивается по объекту, а не по содержимому
+    __hash__ = object.__hash__
+    __eq__ = object.__eq__
+
+
+# Кеширование фрагмента шаблона до изменения данных из перечисленных групп:
+# {% fragment_cache 'sidebar_tags' 'tag' %} ... {% endfragment_cache %}
+@register.tag
+def fragment_cache(parser, token):
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' принимает имя фрагмента и хотя бы одну группу данных")
+    nodelist = parser.parse(('endfragment_cache',))
+    parser.delete_first_token()
+    if not hasattr(parser, 'fragment_cache_nodes'):
+        parser.fragment_cache_nodes = FragmentSiblings()
+    node = FragmentCacheNode(nodelist, parser.compile_filter(bits[1]), [parser.compile_filter(bit) for bit in bits[2:]],
+                             parser.fragment_cache_nodes)
+    parser.fragment_cache_nodes.append(node)
+    return node
+
+
+# Возраст записи: {{ article.time_update|time_since }} -> "3 дня назад"
+@register.filter
+def time_since(value):
+    return get_time_since(value) if value else ''
+
+
+# Вывод тегов, с сортировкой по кол-ву опубликованных статей, которые используют этот тег
 @register.simple_tag
 def popular_tags():
-    tags = Tag.objects.annotate(num_times=Count('article')).order_by('-num_times')
-    tag_list = list(tags.values('name', 'num_times', 'slug'))
-    return tag_list
+    return TagStats.objects.cloud()
 
 # Вывод 5 последних комментариев
 @register.inclusion_tag('includes/latest_comments.html')
 def show_latest_comments(count=5):
-    comments = Comment.objects.select_related('author').filter(status='published').order_by('-time_create')[:count]
+    comments = Comment.objects.select_related('author', 'article').filter(status='published').order_by('-time_create')[:count]
     return {'comments': comments}
 
 
-# Вывод популярных статей по просмотрам
+# Вывод популярных статей по просмотрам (лидеры из Redis, см. leaderboard.py)
+@register.simple_tag
+def popular_articles(window='7d', count=10):
+    return get_popular_articles(window, count)
+
+
+# Первая страница корневых комментариев статьи из кеша: {% comment_page article as comments_page %}
 @register.simple_tag
-def popular_articles():
-    now_time = timezone.now()
-    # вычисляем дату начала дня (00:00) 7 дней назад
-    start_date = now_time - timedelta(days=7)
-    # вычисляем дату начала текущего дня (00:00)
-    today_start = timezone.make_aware(datetime.combine(date.today(), time.min))
-    # Получаем все статьи и количество их просмотров за последние 7 дней
-    articles = Article.objects.annotate(
-        total_view_count=Count('views', filter=Q(views__viewed_on__gte=start_date)),
-        today_view_count=Count('views', filter=Q(views__viewed_on__gte=today_start))
-    ).prefetch_related('views')
-    # Cортируем статьи по кол-ву просмотров
-    popular_articles_list = articles.order_by('-total_view_count', '-today_view_count')[:10]
-    return popular_articles_list
+def comment_page(article):
+    page = get_comment_page(article.id)
+    return {**page, 'html': mark_safe(page['html'])}
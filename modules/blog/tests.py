@@ -1,3 +1,182 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from taggit.models import Tag
+
+from .comment_import import import_comments, parse_comment_row
+from .models import Article, ArticleStats, Category, Comment, TagStats, ViewCount
+from .search.memory import MemorySearchBackend
+from .tracking import save_buffered_views
+from modules.services.paginator import CursorPaginator
+
+
+User = get_user_model()
+
+
+class BlogTestCase(TestCase):
+    # Общие данные: автор и категория для статей
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', password='password')
+        cls.category = Category.objects.create(title='Python', slug='python', description='Python')
+
+    def create_article(self, title, full_description='', **kwargs):
+        return Article.objects.create(title=title, short_description=title, full_description=full_description,
+                                      category=self.category, author=self.author, **kwargs)
+
+
+class CursorPaginatorTest(BlogTestCase):
+    ordering = ('-fixed', '-time_create', 'id')
+
+    def setUp(self):
+        now = timezone.now()
+        for number in range(7):
+            article = self.create_article(f'Статья {number}', fixed=number == 5)
+            # У двух статей одинаковое время: порядок между ними определяет id
+            Article.objects.filter(id=article.id).update(time_create=now - timedelta(minutes=number // 2))
+        self.expected = list(Article.objects.all().order_by(*self.ordering).values_list('id', flat=True))
+
+    def test_forward_and_backward_round_trip(self):
+        paginator = CursorPaginator(Article.objects.all(), 3, self.ordering)
+        pages, page = [], paginator.get_page()
+        while True:
+            pages.append(page)
+            if not page.has_next():
+                break
+            page = paginator.get_page(page.next_cursor)
+        self.assertEqual([article.id for page in pages for article in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        page = pages[-1]
+        for expected_page in reversed(pages[:-1]):
+            page = paginator.get_page(page.previous_cursor)
+            self.assertEqual([article.id for article in page], [article.id for article in expected_page])
+        self.assertFalse(page.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = CursorPaginator(Article.objects.all(), 3, self.ordering)
+        self.assertEqual([article.id for article in paginator.get_page('invalid')], self.expected[:3])
+
+
+class ImportCommentsTest(BlogTestCase):
+
+    def setUp(self):
+        self.article = self.create_article('Статья')
+
+    def row(self, key, parent=None, minutes=0, **kwargs):
+        time_create = (timezone.now() - timedelta(hours=1) + timedelta(minutes=minutes)).isoformat()
+        return parse_comment_row({'key': key, 'parent': parent, 'article_id': self.article.id,
+                                  'author_id': self.author.id, 'content': key, 'time_create': time_create, **kwargs})
+
+    def assertValidTree(self, tree_id):
+        # lft/rght/level совпадают с тем, что построит django-mptt для тех же родителей
+        imported = list(Comment.objects.filter(tree_id=tree_id).order_by('lft').values_list('id', 'lft', 'rght', 'level'))
+        Comment.objects.partial_rebuild(tree_id)
+        rebuilt = list(Comment.objects.filter(tree_id=tree_id).order_by('lft').values_list('id', 'lft', 'rght', 'level'))
+        self.assertEqual(imported, rebuilt)
+
+    def test_new_trees(self):
+        count = import_comments([self.row('1'), self.row('2', '1', 1), self.row('3', '1', 2),
+                                 self.row('4', '2', 3), self.row('5', minutes=4)])
+        self.assertEqual(count, 5)
+        root = Comment.objects.get(content='1')
+        self.assertEqual((root.lft, root.rght, root.level), (1, 8, 0))
+        self.assertEqual([comment.content for comment in root.get_descendants()], ['2', '4', '3'])
+        self.assertEqual(Comment.objects.get(content='4').level, 2)
+        self.assertNotEqual(Comment.objects.get(content='5').tree_id, root.tree_id)
+        self.assertValidTree(root.tree_id)
+        self.assertEqual(ArticleStats.objects.get(article=self.article).comment_count, 5)
+
+    def test_replies_to_existing_comment(self):
+        parent = Comment.objects.create(article=self.article, author=self.author, content='parent')
+        import_comments([self.row('1', parent_id=parent.id), self.row('2', '1', 1)])
+        parent.refresh_from_db()
+        self.assertEqual([comment.content for comment in parent.get_descendants()], ['1', '2'])
+        self.assertEqual(Comment.objects.get(content='2').level, 2)
+        self.assertValidTree(parent.tree_id)
+
+    def test_reply_to_other_article_is_rejected(self):
+        other = self.create_article('Другая статья')
+        with self.assertRaises(ValueError):
+            import_comments([self.row('1'), self.row('2', '1', article_id=other.id)])
+        self.assertFalse(Comment.objects.exists())
+
+
+class SaveBufferedViewsTest(BlogTestCase):
+
+    def setUp(self):
+        self.article = self.create_article('Статья')
+        self.other = self.create_article('Другая статья')
+        self.now = timezone.now().timestamp()
+
+    def entry(self, article_id, ip_address, offset=0):
+        return f'{article_id}|{ip_address}|{self.now + offset}'.encode()
+
+    def test_dedupes_and_counts_only_inserted_views(self):
+        ViewCount.objects.create(article=self.other, ip_address='10.0.0.3')
+        saved = save_buffered_views([
+            self.entry(self.article.id, '10.0.0.1', 10),
+            self.entry(self.article.id, '10.0.0.1'),
+            self.entry(self.article.id, '10.0.0.2'),
+            self.entry(self.other.id, '10.0.0.3'),
+            self.entry(0, '10.0.0.4'),
+            b'broken',
+        ])
+        self.assertEqual(saved, 2)
+        self.assertEqual(ViewCount.objects.filter(article=self.article).count(), 2)
+        # Из повторов пачки сохраняется самый ранний просмотр
+        self.assertEqual(ViewCount.objects.get(article=self.article, ip_address='10.0.0.1').viewed_on.timestamp(),
+                         self.now)
+        self.assertEqual(ArticleStats.objects.get(article=self.article).view_count, 2)
+        self.assertEqual(ArticleStats.objects.get(article=self.other).view_count, 1)
+
+    def test_empty_batch(self):
+        self.assertEqual(save_buffered_views([b'broken']), 0)
+        self.assertFalse(ViewCount.objects.exists())
+
+
+class MemorySearchBackendTest(BlogTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(SEARCH_INDEX_PATH=f'{directory.name}/index.pickle')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.in_title = self.create_article('Кеширование в Django', 'Заметки о производительности')
+        self.in_text = self.create_article('Производительность', 'Кеширование страниц и фрагментов')
+        self.other = self.create_article('Очереди задач', 'Celery и Redis')
+        self.draft = self.create_article('Кеширование черновика', 'Кеширование', status='draft')
+        tag = Tag.objects.create(name='Кеширование', slug='caching')
+        self.in_title.tags.add(tag)
+        self.backend = MemorySearchBackend()
+        self.backend.rebuild()
+
+    def test_title_match_ranks_higher(self):
+        results = list(self.backend.search('кеширование').order_by('-rank', 'id'))
+        self.assertEqual([article.id for article in results], [self.in_title.id, self.in_text.id])
+        self.assertGreater(results[0].rank, results[1].rank)
+
+    def test_all_terms_required(self):
+        self.assertEqual(list(self.backend.search('кеширование celery')), [])
+        self.assertEqual([article.id for article in self.backend.search('celery redis')], [self.other.id])
+
+    def test_reindex_is_seen_by_other_process(self):
+        other_process = MemorySearchBackend()
+        self.assertEqual(len(other_process.index), 3)
+        Article.objects.filter(id=self.other.id).update(status='draft')
+        self.backend.reindex([self.other.id, self.draft.id])
+        self.assertEqual(list(other_process.search('celery')), [])
+        self.assertEqual(len(other_process.index), 2)
+
+    def test_suggest(self):
+        self.assertEqual(TagStats.objects.get(tag__slug='caching').published_count, 1)
+        suggestions = self.backend.suggest('кеширов', 5)
+        self.assertEqual({article['slug'] for article in suggestions['articles']},
+                         {self.in_title.slug, self.in_text.slug})
+        self.assertEqual(suggestions['tags'], [{'name': 'Кеширование', 'slug': 'caching'}])
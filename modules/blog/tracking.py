@@ -0,0 +1,119 @@
+import re
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Article, ArticleStats, ViewCount
+from modules.services.cache import bump_generation
+from modules.services.redis_client import get_redis_connection
+from modules.services.utils import get_client_ip
+
+
+CRAWLER_RE = re.compile(settings.VIEW_COUNT_CRAWLER_PATTERN, re.IGNORECASE)
+
+
+def is_crawler(request):
+    # Поисковые роботы и утилиты без User-Agent не считаются просмотрами
+    user_agent = request.META.get('HTTP_USER_AGENT', '')
+    return not user_agent or bool(CRAWLER_RE.search(user_agent))
+
+
+def record_view(request, article_id):
+    # Учет просмотра статьи: синхронно в БД или в буфер Redis (VIEW_COUNT_BUFFER_ENABLED)
+    if settings.VIEW_COUNT_SKIP_CRAWLERS and is_crawler(request):
+        return
+    ip_address = get_client_ip(request)
+    if settings.VIEW_COUNT_BUFFER_ENABLED:
+        entry = f'{article_id}|{ip_address}|{timezone.now().timestamp()}'
+        get_redis_connection().rpush(settings.VIEW_COUNT_BUFFER_KEY, entry)
+    else:
+        ViewCount.objects.get_or_create(article_id=article_id, ip_address=ip_address)
+
+
+def processing_key():
+    # Пачка, забранная из буфера, лежит здесь до фиксации транзакции с просмотрами
+    return f'{settings.VIEW_COUNT_BUFFER_KEY}:processing'
+
+
+def pop_view_buffer(batch_size):
+    # Перенос не более batch_size записей из буфера в список обработки (RPOPLPUSH атомарен для каждой записи)
+    pipe = get_redis_connection().pipeline(transaction=False)
+    for _ in range(batch_size):
+        pipe.rpoplpush(settings.VIEW_COUNT_BUFFER_KEY, processing_key())
+    return [entry for entry in pipe.execute() if entry is not None]
+
+
+def parse_view_entry(entry):
+    # (id статьи, IP-адрес, время просмотра) или None для поврежденной записи
+    try:
+        article_id, ip_address, timestamp = entry.decode().split('|')
+        return int(article_id), ip_address, datetime.fromtimestamp(float(timestamp), tz=dt_timezone.utc)
+    except (UnicodeDecodeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def save_buffered_views(entries):
+    # Дедупликация пачки и запись новых просмотров одним bulk_create
+    views = {}
+    for entry in entries:
+        view = parse_view_entry(entry)
+        if view is None:
+            # Поврежденная запись не должна блокировать перенос всей пачки
+            continue
+        article_id, ip_address, viewed_on = view
+        key = (article_id, ip_address)
+        if key not in views or viewed_on < views[key]:
+            views[key] = viewed_on
+    if not views:
+        return 0
+
+    article_ids = {article_id for article_id, _ in views}
+    ip_addresses = {ip_address for _, ip_address in views}
+    with transaction.atomic():
+        # Статьи могли удалить, пока просмотры лежали в буфере
+        existing_articles = set(Article.objects.filter(id__in=article_ids).values_list('id', flat=True))
+        already_viewed = set(ViewCount.objects.filter(article_id__in=article_ids, ip_address__in=ip_addresses)
+                             .values_list('article_id', 'ip_address'))
+        new_views = [
+            ViewCount(article_id=article_id, ip_address=ip_address, viewed_on=viewed_on)
+            for (article_id, ip_address), viewed_on in views.items()
+            if article_id in existing_articles and (article_id, ip_address) not in already_viewed
+        ]
+        ViewCount.objects.bulk_create(new_views, ignore_conflicts=True)
+        # bulk_create не отправляет post_save, поэтому счетчики ArticleStats обновляем сами - только на
+        # просмотры, которых не было в БД (ignore_conflicts молча пропускает уже записанные)
+        for article_id, count in Counter(view.article_id for view in new_views).items():
+            ArticleStats.objects.increment(article_id, view_count=count)
+        if new_views:
+            # Одна смена поколения на пачку вместо post_save каждого просмотра (ETag списков)
+            transaction.on_commit(lambda: bump_generation('views'))
+    return len(new_views)
+
+
+def flush_view_buffer():
+    """
+    Перенос буфера просмотров в БД пачками по VIEW_COUNT_BATCH_SIZE. Пачка удаляется из списка обработки
+    только после записи в БД: при ошибке она остается там и повторяется следующим запуском задачи.
+    Список обработки общий, поэтому одновременно работает один перенос: наложившийся запуск пропускается.
+    """
+    redis = get_redis_connection()
+    lock = redis.lock(f'{settings.VIEW_COUNT_BUFFER_KEY}:lock', timeout=settings.VIEW_COUNT_FLUSH_LOCK_TIMEOUT,
+                      blocking=False)
+    if not lock.acquire():
+        return 0
+    try:
+        # Пачка, оставшаяся в списке обработки после сбоя прошлого переноса
+        saved = save_buffered_views(redis.lrange(processing_key(), 0, -1))
+        redis.delete(processing_key())
+        batch_size = settings.VIEW_COUNT_BATCH_SIZE
+        while True:
+            entries = pop_view_buffer(batch_size)
+            saved += save_buffered_views(entries)
+            redis.delete(processing_key())
+            if len(entries) < batch_size:
+                return saved
+    finally:
+        lock.release()
@@ -1,7 +1,9 @@
 from django.urls import path
 from .views import (ArticleListView, ArticleDetailView, ArticleByCategoryListView,
                     articles_list, ArticleCreateView, ArticleUpdateView, ArticleDeleteView, CommentCreateView,
-                    ArticleByTagListView, ArticleSearchResultView, RatingCreateView, ArticleBySignedUser)
+                    CommentListView, CommentRepliesView,
+                    ArticleByTagListView, ArticleSearchResultView, ArticleSuggestView, RatingCreateView,
+                    ArticleBySignedUser)
 
 urlpatterns = [
     path('', ArticleListView.as_view(), name='home'),
@@ -11,9 +13,12 @@ urlpatterns = [
     path('articles/<str:slug>/update/', ArticleUpdateView.as_view(), name='articles_update'),
     path('articles/<str:slug>/delete/', ArticleDeleteView.as_view(), name='articles_delete'),
     path('articles/<str:slug>/', ArticleDetailView.as_view(), name='articles_detail'),
+    path('articles/<int:pk>/comments/', CommentListView.as_view(), name='comment_list'),
     path('articles/<int:pk>/comments/create/', CommentCreateView.as_view(), name='comment_create_view'),
+    path('comments/<int:pk>/replies/', CommentRepliesView.as_view(), name='comment_replies'),
     path('articles/tags/<str:tag>/', ArticleByTagListView.as_view(), name='articles_by_tags'),
     path('category/<str:slug>/', ArticleByCategoryListView.as_view(), name="articles_by_category"),
     path('search/', ArticleSearchResultView.as_view(), name='search'),
+    path('search/suggest/', ArticleSuggestView.as_view(), name='search_suggest'),
     path('rating/', RatingCreateView.as_view(), name='rating'),
 ]
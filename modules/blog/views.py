@@ -1,66 +1,35 @@
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
-from django.core.paginator import Paginator
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from taggit.models import Tag
-from django.db.models import Count
-import random
-from django.utils import timezone
+from django.conf import settings
 
 
 from .forms import ArticleCreateForm, ArticleUpdateForm, CommentCreateForm
-from .models import Article, Category, Comment, Rating
-from .mixins import ViewCountMixin
-from ..services.mixins import AuthorRequiredMixin
+from .models import Article, ArticleStats, Comment, Rating
+from .categories import get_category_tree
+from .comments import get_comment_page, get_comment_replies
+from .conditional import article_validators
+from .mixins import ArticleListConditionalMixin, ArticleListPageCacheMixin, ViewCountMixin
+from .tracking import record_view
+from .search import search_articles, suggest
+from .similarity import get_similar_articles
+from ..services.mixins import AuthorRequiredMixin, ConditionalGetMixin, CursorPaginationMixin, PageCacheMixin, ThrottleMixin
+from ..services.paginator import CursorPaginator
 from ..services.utils import get_client_ip
 
 
-class ArticleListView(ListView):
+class ArticleListView(ArticleListConditionalMixin, ArticleListPageCacheMixin, CursorPaginationMixin, ListView):
     model = Article
     template_name = 'blog/articles_list.html'
     context_object_name = 'articles'
     paginate_by = 3
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        for article in queryset:
-            article.time_since_update = self.calculate_article_age(article.time_update)
-        return queryset
-
-    def calculate_article_age(self, time_update):
-        current_date = timezone.now()
-        age = current_date - time_update
-        age_seconds = age.total_seconds()
-        days = int(age_seconds/(60*60*24))
-        hour = int(age_seconds/(60*60))
-        minutes = int(age_seconds/(60))
-        if days > 0:
-            if days == 1:
-                return f"{days} день назад"
-            elif days == 2 or days == 3 or days == 4:
-                return f"{days} дня назад"
-            else:
-                return f"{days} дней назад"
-        elif hour > 0:
-            if hour == 1:
-                return f"{hour} час назад"
-            elif hour == 2 or hour == 3 or hour == 4:
-                return f"{hour} часа назад"
-            else:
-                return f"{hour} часов назад"
-        elif minutes > 0:
-            if minutes == 1:
-                return f"{minutes} минуту назад"
-            elif minutes == 2 or minutes == 3 or minutes == 4:
-                return f"{minutes}минуты назад"
-            else:
-                return f"{minutes} минут назад"
-        else:
-            return 'Неавно'
+    def get_page_cache_keys(self, context):
+        return super().get_page_cache_keys(context) + ['home']
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -68,70 +37,67 @@ class ArticleListView(ListView):
         return context
 
 
-class ArticleDetailView(ViewCountMixin, DetailView):
+class ArticleDetailView(ConditionalGetMixin, PageCacheMixin, ViewCountMixin, DetailView):
     model = Article
     template_name = 'blog/articles_detail.html'
     context_object_name = 'article'
     queryset = model.objects.detail()
+    validated_article_id = None
 
-    def get_similar_articles(self, obj):
-        article_tags_ids = obj.tags.values_list('id', flat=True)
-        similar_articles = Article.objects.filter(tags__in=article_tags_ids).exclude(id=obj.id)
-        similar_articles = similar_articles.annotate(related_tags=Count('tags')).order_by('-related_tags')
-        similar_articles_list = list(similar_articles.all())
-        random.shuffle(similar_articles_list)
-        return similar_articles_list[:6]
-
-    def calculate_article_age(self, time_update):
-        current_date = timezone.now()
-        age = current_date - time_update
-        age_seconds = age.total_seconds()
-        days = int(age_seconds / (60 * 60 * 24))
-        hour = int(age_seconds / (60 * 60))
-        minutes = int(age_seconds / (60))
-        if days > 0:
-            if days == 1:
-                return f"{days} день назад"
-            elif days == 2 or days == 3 or days == 4:
-                return f"{days} дня назад"
-            else:
-                return f"{days} дней назад"
-        elif hour > 0:
-            if hour == 1:
-                return f"{hour} час назад"
-            elif hour == 2 or hour == 3 or hour == 4:
-                return f"{hour} часа назад"
-            else:
-                return f"{hour} часов назад"
-        elif minutes > 0:
-            if minutes == 1:
-                return f"{minutes} минуту назад"
-            elif minutes == 2 or minutes == 3 or minutes == 4:
-                return f"{minutes}минуты назад"
-            else:
-                return f"{minutes} минут назад"
-        else:
-            return 'Недавно'
+    def get_validators(self):
+        validators = article_validators(self.request, self.kwargs['slug'])
+        if validators is None:
+            return None
+        self.validated_article_id, etag, last_modified = validators
+        return etag, last_modified
+
+    def not_modified(self):
+        # Ответ 304 - тоже просмотр статьи
+        record_view(self.request, self.validated_article_id)
+
+    def get_page_cache_keys(self, context):
+        return super().get_page_cache_keys(context) + [
+            f'article:{self.object.id}', f'category:{self.object.category_id}',
+        ]
+
+    def get_page_cache_meta(self, context):
+        return {'article_id': self.object.id}
+
+    def page_cache_hit(self, meta):
+        # Просмотр учитывается и при ответе из кеша страниц
+        record_view(self.request, meta['article_id'])
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = self.object.title
         context['form'] = CommentCreateForm
-        context['similar_articles'] = self.get_similar_articles(self.object)
-        context['time_since_update'] = self.calculate_article_age(self.object.time_update)
+        context['similar_articles'] = get_similar_articles(self.object, settings.SIMILAR_ARTICLES_SHOWN)
         return context
 
 
-class ArticleByCategoryListView(ListView):
+class ArticleByCategoryListView(ArticleListConditionalMixin, ArticleListPageCacheMixin, ListView):
+    # Статьи категории и всех ее подкатегорий
     model = Article
     template_name = 'blog/articles_list.html'
     context_object_name = 'articles'
+    paginate_by = 10
     category = None
 
     def get_queryset(self):
-        self.category = Category.objects.get(slug=self.kwargs['slug'])
-        queryset = Article.objects.all().filter(category__slug=self.category.slug)
-        return queryset
+        category_tree = get_category_tree()
+        self.category = category_tree.get_by_slug(self.kwargs['slug'])
+        if self.category is None:
+            raise Http404('Категория не найдена')
+        return category_tree.articles(self.category)
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        # Количество статей уже посчитано в снимке дерева, отдельный COUNT(*) не нужен
+        paginator = super().get_paginator(queryset, per_page, orphans, allow_empty_first_page, **kwargs)
+        paginator.count = self.category.total_article_count
+        return paginator
+
+    def get_page_cache_keys(self, context):
+        return super().get_page_cache_keys(context) + [f'category:{self.category.id}']
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -139,7 +105,7 @@ class ArticleByCategoryListView(ListView):
         return context
 
 
-class ArticleByTagListView(ListView):
+class ArticleByTagListView(ArticleListConditionalMixin, ArticleListPageCacheMixin, CursorPaginationMixin, ListView):
     model = Article
     template_name = 'blog/articles_list.html'
     context_object_name = 'articles'
@@ -151,6 +117,9 @@ class ArticleByTagListView(ListView):
         queryset = Article.objects.all().filter(tags__slug=self.tag.slug)
         return queryset
 
+    def get_page_cache_keys(self, context):
+        return super().get_page_cache_keys(context) + [f'tag:{self.tag.slug}']
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = f'Статьи по тегу: {self.tag.name}'
@@ -158,15 +127,15 @@ class ArticleByTagListView(ListView):
 
 
 def articles_list(request):
-    articles = Article.objects.all().order_by('-time_create')
-    paginator = Paginator(articles, per_page=3)
-    page_number = request.GET.get('page')
-    page_object = paginator.get_page(page_number)
+    articles = Article.objects.all()
+    paginator = CursorPaginator(articles, per_page=3, ordering=('-time_create', 'id'))
+    page_object = paginator.get_page(request.GET.get('cursor'))
+    page_object.build_urls(request.GET)
     context = {'page_obj': page_object}
     return render(request, 'blog/articles_func_list.html', context)
 
 
-class ArticleBySignedUser(LoginRequiredMixin, ListView):
+class ArticleBySignedUser(LoginRequiredMixin, CursorPaginationMixin, ListView):
     # Список статей авторов, на которых подписан пользователь
     model = Article
     template_name = 'blog/articles_list.html'
@@ -185,20 +154,17 @@ class ArticleBySignedUser(LoginRequiredMixin, ListView):
         return context
 
 
-class ArticleSearchResultView(ListView):
+class ArticleSearchResultView(CursorPaginationMixin, ListView):
     # Поиск статей на сайте
     model = Article
     context_object_name = 'articles'
     paginate_by = 10
+    cursor_ordering = ('-rank', 'id')
     allow_empty = True
     template_name = 'blog/articles_list.html'
 
     def get_queryset(self):
-        query = self.request.GET.get('do')
-        search_vector = SearchVector('full_description', weight='B') + SearchVector('title', weight='A')
-        search_query = SearchQuery(query)
-        return (self.model.objects.annotate(rank=SearchRank(search_vector, search_query)).filter(rank__gte=0.3)
-                .order_by('-rank'))
+        return search_articles(self.request.GET.get('do', '').strip())
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -206,6 +172,12 @@ class ArticleSearchResultView(ListView):
         return context
 
 
+class ArticleSuggestView(View):
+    # Подсказки при вводе поискового запроса (JSON)
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(suggest(request.GET.get('do', '')))
+
+
 class ArticleCreateView(LoginRequiredMixin, CreateView):
     # Представение: создание материалов на сайте
     model = Article
@@ -255,8 +227,9 @@ class ArticleDeleteView(AuthorRequiredMixin, DeleteView):
         return context
 
 
-class CommentCreateView(LoginRequiredMixin, CreateView):
+class CommentCreateView(LoginRequiredMixin, ThrottleMixin, CreateView):
     model = Comment
+    throttle_scope = 'comment'
     form_class = CommentCreateForm
 
     def is_ajax(self):
@@ -292,8 +265,26 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
         return JsonResponse({'error': 'Необходимо авторизоваться для добавления комментариев'}, status=400)
 
 
-class RatingCreateView(View):
+class CommentListView(View):
+    # Страница корневых комментариев статьи (AJAX), ответы загружаются отдельно через CommentRepliesView
+    def get(self, request, pk):
+        # Комментарии черновиков недоступны так же, как сами черновики (ArticleDetailView)
+        if not Article.objects.filter(pk=pk, status='published').exists():
+            raise Http404('Статья не найдена')
+        return JsonResponse(get_comment_page(pk, request.GET.get('cursor')))
+
+
+class CommentRepliesView(View):
+    # Все ответы на корневой комментарий (AJAX)
+    def get(self, request, pk):
+        comment = get_object_or_404(Comment.objects.only('id', 'article_id', 'tree_id', 'lft', 'rght'),
+                                    pk=pk, article__status='published')
+        return JsonResponse(get_comment_replies(comment))
+
+
+class RatingCreateView(ThrottleMixin, View):
     model = Rating
+    throttle_scope = 'rating'
 
     def post(self, request, *args, **kwargs):
         article_id = request.POST.get('article_id')
@@ -310,10 +301,13 @@ class RatingCreateView(View):
         if not created:
             if rating.value == value:
                 rating.delete()
-                return JsonResponse({'status': 'deleted', 'rating_sum': rating.article.get_sum_rating()})
+                status = 'deleted'
             else:
                 rating.value = value
                 rating.user = user
                 rating.save()
-                return JsonResponse({'status': 'updated', 'rating_sum': rating.article.get_sum_rating()})
-        return JsonResponse({'status': 'created', 'rating_sum': rating.article.get_sum_rating()})
+                status = 'updated'
+        else:
+            status = 'created'
+        rating_sum = ArticleStats.objects.filter(article_id=article_id).values_list('rating_sum', flat=True).first()
+        return JsonResponse({'status': status, 'rating_sum': rating_sum or 0})
\ No newline at end of file
@@ -0,0 +1,96 @@
+import time
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .redis_client import get_redis_connection
+
+
+FRAGMENT_STATS_KEY = 'fragment:stats'
+
+
+def generation_key(group):
+    return f'generation:{group}'
+
+
+def get_generations(*groups):
+    # Поколения групп данных (метка времени последнего изменения). Отсутствующие создаются текущим временем.
+    keys = {generation_key(group): group for group in groups}
+    generations = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in generations}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        generations.update(missing)
+    return {keys[key]: value for key, value in generations.items()}
+
+
+def bump_generation(*groups):
+    # Смена поколения делает недействительными все ключи кеша, построенные на этих группах
+    now = time.time()
+    cache.set_many({generation_key(group): now for group in groups}, timeout=None)
+
+
+def fragment_cache_key(name):
+    # Версия (поколения групп) хранится вместе с HTML, поэтому фрагменты и поколения читаются одним get_many
+    return f'fragment:{name}'
+
+
+def fragment_version(generations, groups):
+    return md5(':'.join(f'{generations[group]:.6f}' for group in groups).encode()).hexdigest()
+
+
+def record_fragment_accesses(accesses):
+    # Счетчики попаданий и промахов всех фрагментов страницы одним pipeline: {name: hit}
+    pipeline = get_redis_connection().pipeline(transaction=False)
+    for name, hit in accesses.items():
+        pipeline.hincrby(FRAGMENT_STATS_KEY, f'{name}:{"hit" if hit else "miss"}', 1)
+    pipeline.execute()
+
+
+def get_fragments(fragments):
+    """
+    Чтение нескольких фрагментов за одно обращение к кешу: поколения всех групп и сохраненные фрагменты
+    одним get_many. fragments - {name: groups}, результат - {name: (version, html или None при промахе)}.
+    """
+    generation_keys = {generation_key(group): group for groups in fragments.values() for group in groups}
+    values = cache.get_many([*generation_keys, *(fragment_cache_key(name) for name in fragments)])
+    missing = {key: time.time() for key in generation_keys if key not in values}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        values.update(missing)
+    generations = {group: values[key] for key, group in generation_keys.items()}
+
+    result = {}
+    for name, groups in fragments.items():
+        version = fragment_version(generations, groups)
+        entry = values.get(fragment_cache_key(name))
+        result[name] = (version, entry['html'] if entry and entry['version'] == version else None)
+    record_fragment_accesses({name: html is not None for name, (_, html) in result.items()})
+    return result
+
+
+def store_fragment(name, version, html):
+    cache.set(fragment_cache_key(name), {'version': version, 'html': html}, settings.FRAGMENT_CACHE_TIMEOUT)
+
+
+def get_fragment_stats():
+    # Счетчики попаданий и промахов по фрагментам: {name: {'hit': n, 'miss': n}}
+    stats = {}
+    for field, value in get_redis_connection().hgetall(FRAGMENT_STATS_KEY).items():
+        name, kind = field.decode().rsplit(':', 1)
+        stats.setdefault(name, {'hit': 0, 'miss': 0})[kind] = int(value)
+    return stats
+
+
+def reset_fragment_stats():
+    get_redis_connection().delete(FRAGMENT_STATS_KEY)
+
+
+def get_or_render_fragment(name, groups, render):
+    # HTML фрагмента из кеша или результат render() с сохранением на FRAGMENT_CACHE_TIMEOUT
+    version, html = get_fragments({name: groups})[name]
+    if html is None:
+        html = render()
+        store_fragment(name, version, html)
+    return html
@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+from hashlib import md5
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .utils import has_pending_messages
+
+
+def make_etag(*parts):
+    return '"%s"' % md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def from_timestamp(value):
+    return datetime.fromtimestamp(value, tz=timezone.utc)
+
+
+def latest(*values):
+    # Наибольшая из отметок времени, None пропускаются
+    return max((value for value in values if value is not None), default=None)
+
+
+def conditional_get(request, get_validators, view, not_modified=None):
+    """
+    Условный GET: get_validators() возвращает (etag, last_modified) или None. Если у клиента актуальная копия,
+    отвечаем 304 без вызова view(), иначе добавляем ETag и Last-Modified к ответу view().
+    """
+    if request.method not in ('GET', 'HEAD') or has_pending_messages(request):
+        return view()
+    validators = get_validators()
+    if validators is None:
+        return view()
+    etag, last_modified = validators
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        if not_modified is not None and response.status_code == 304:
+            not_modified()
+        return response
+    response = view()
+    if response.status_code == 200:
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+    return response
@@ -0,0 +1,117 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+
+VARIANTS_FOLDER = 'variants'
+VARIANT_FORMATS = ('webp', 'jpeg')
+# Параметры сохранения по форматам вариантов
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'method': 6},
+    'jpeg': {'format': 'JPEG', 'optimize': True, 'progressive': True},
+}
+
+# Отправляется задачей generate_image_variants_task после создания вариантов: sender - модель, instance, field_name
+image_variants_ready = Signal()
+
+
+def image_changed(image, initial_name):
+    # Загружено новое изображение (изображение по умолчанию обрабатывается командой generate_image_variants)
+    return bool(image) and image.name != initial_name and image.name != image.field.default
+
+
+def variant_name(name, width, image_format):
+    # images/avatars/2023/11/10/photo.jpg -> variants/images/avatars/2023/11/10/photo-120w.webp
+    root, _ = os.path.splitext(name)
+    return f'{VARIANTS_FOLDER}/{root}-{width}w.{image_format}'
+
+
+def widths_name(name):
+    # Список записанных ширин: images/avatars/photo.jpg -> variants/images/avatars/photo.widths
+    root, _ = os.path.splitext(name)
+    return f'{VARIANTS_FOLDER}/{root}.widths'
+
+
+def variant_widths(kind, source_width=None):
+    # Ширины IMAGE_VARIANT_WIDTHS[kind]; с source_width - без увеличения: ширины меньше исходной
+    # и вместо всех остальных один вариант шириной исходника
+    widths = sorted(settings.IMAGE_VARIANT_WIDTHS[kind])
+    if source_width is None:
+        return widths
+    smaller = [width for width in widths if width < source_width]
+    return smaller + [source_width] if len(smaller) < len(widths) else smaller
+
+
+def read_variant_widths(name):
+    # Ширины созданных вариантов или None, пока задача их не создала
+    try:
+        with default_storage.open(widths_name(name), 'rb') as widths_file:
+            return [int(width) for width in widths_file.read().split()]
+    except (OSError, ValueError):
+        return None
+
+
+def save_file(target, data):
+    if default_storage.exists(target):
+        default_storage.delete(target)
+    return default_storage.save(target, ContentFile(data))
+
+
+def delete_files(names):
+    for target in names:
+        if default_storage.exists(target):
+            default_storage.delete(target)
+
+
+def generate_image_variants(name, kind):
+    """
+    Варианты изображения из хранилища в WebP и JPEG для ширин variant_widths (без увеличения исходника).
+    Последним записывается список ширин: по нему шаблоны узнают, что варианты готовы (get_image_variants).
+    """
+    with default_storage.open(name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    widths = variant_widths(kind, image.width)
+    created = []
+    for image_format in VARIANT_FORMATS:
+        for width in widths:
+            variant = image.copy()
+            variant.thumbnail((width, width * 10), Image.LANCZOS)
+            if image_format == 'jpeg' and variant.mode != 'RGB':
+                # У JPEG нет прозрачности: фон белый, как у страницы
+                background = Image.new('RGB', variant.size, 'white')
+                background.paste(variant, mask=variant.getchannel('A'))
+                variant = background
+            output = BytesIO()
+            variant.save(output, quality=settings.IMAGE_VARIANT_QUALITY, **SAVE_OPTIONS[image_format])
+            created.append(save_file(variant_name(name, width, image_format), output.getvalue()))
+    # Варианты прошлой генерации, которых нет в новом наборе
+    for width in set(read_variant_widths(name) or ()) - set(widths):
+        delete_files(variant_name(name, width, image_format) for image_format in VARIANT_FORMATS)
+    save_file(widths_name(name), ' '.join(map(str, widths)).encode())
+    return created
+
+
+def delete_image_variants(name, kind):
+    widths = read_variant_widths(name) or variant_widths(kind)
+    delete_files([widths_name(name), *(variant_name(name, width, image_format)
+                                       for image_format in VARIANT_FORMATS for width in widths)])
+
+
+def get_image_variants(name, kind):
+    # {формат: [(url, ширина)]} только для записанных ширин или None, пока задача не создала варианты
+    # (выводится исходник)
+    if not name:
+        return None
+    widths = read_variant_widths(name)
+    if not widths:
+        return None
+    return {image_format: [(default_storage.url(variant_name(name, width, image_format)), width) for width in widths]
+            for image_format in VARIANT_FORMATS}
@@ -0,0 +1,23 @@
+from django.core.management import BaseCommand
+
+from modules.services.cache import get_fragment_stats, reset_fragment_stats
+
+
+class Command(BaseCommand):
+    """
+    Команда для вывода счетчиков попаданий и промахов кеша фрагментов шаблонов
+    """
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Обнулить счетчики после вывода')
+
+    def handle(self, *args, **options):
+        stats = get_fragment_stats()
+        if not stats:
+            self.stdout.write('No fragment cache statistics yet')
+        for name, counters in sorted(stats.items()):
+            total = counters['hit'] + counters['miss']
+            ratio = counters['hit'] / total * 100 if total else 0
+            self.stdout.write(f"{name}: hits={counters['hit']} misses={counters['miss']} hit ratio={ratio:.1f}%")
+        if options['reset']:
+            reset_fragment_stats()
+            self.stdout.write(self.style.SUCCESS('Statistics reset'))
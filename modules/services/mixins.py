@@ -1,8 +1,16 @@
 from django.contrib.auth.mixins import AccessMixin, UserPassesTestMixin
 from django.contrib import messages
-from django.shortcuts import redirect
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import redirect, render
 from django.core.exceptions import PermissionDenied
 
+from .conditional import conditional_get
+from .page_cache import get_cached_page, is_page_cacheable, page_cache_key, store_page
+from .paginator import CursorPaginator
+from .throttling import consume_token
+from .utils import get_client_ip
+
 
 class AuthorRequiredMixin(AccessMixin):
 
@@ -27,3 +35,103 @@ class UserIsNotAuthenticated(UserPassesTestMixin):
 
     def handle_no_permission(self):
         return redirect('home')
+
+
+class CursorPaginationMixin:
+    # Курсорная пагинация для ListView: ?cursor=<токен> вместо ?page=<номер>
+    cursor_ordering = ('-fixed', '-time_create', 'id')
+    cursor_count_limit = 1000
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, self.cursor_ordering, self.cursor_count_limit)
+        page = paginator.get_page(self.request.GET.get('cursor'))
+        page.build_urls(self.request.GET)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class ThrottleMixin:
+    """
+    Ограничение частоты запросов к представлению (token bucket в Redis, THROTTLE_RATES[throttle_scope]).
+    Учет ведется по пользователю, для анонимных посетителей - по IP-адресу.
+    """
+    throttle_scope = None
+    throttle_methods = ('POST',)
+
+    def get_throttle_identity(self):
+        if self.request.user.is_authenticated:
+            return f'user:{self.request.user.id}'
+        return f'ip:{get_client_ip(self.request)}'
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in self.throttle_methods:
+            allowed, retry_after = consume_token(self.throttle_scope, self.get_throttle_identity())
+            if not allowed:
+                return self.throttled(retry_after)
+        return super().dispatch(request, *args, **kwargs)
+
+    def throttled(self, retry_after):
+        message = f'Слишком много запросов, повторите через {retry_after} сек.'
+        if self.request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            response = JsonResponse({'error': message, 'retry_after': retry_after}, status=429)
+        else:
+            response = render(self.request, 'system/errors/error_page.html', status=429, context={
+                'title': 'Слишком много запросов: 429',
+                'error_message': message,
+            })
+        response['Retry-After'] = str(retry_after)
+        return response
+
+
+class PageCacheMixin:
+    """
+    Кеш страниц целиком для анонимных посетителей. Страница помечается суррогатными ключами
+    (get_page_cache_keys), сигналы моделей удаляют из кеша только страницы с затронутыми ключами.
+    """
+    page_cache_timeout = None
+
+    def get_page_cache_keys(self, context):
+        return ['sidebar']
+
+    def get_page_cache_meta(self, context):
+        # Данные, которые нужны представлению при ответе из кеша (например, id статьи для учета просмотра)
+        return {}
+
+    def page_cache_hit(self, meta):
+        pass
+
+    def dispatch(self, request, *args, **kwargs):
+        if not is_page_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+        key = page_cache_key(request)
+        cached = get_cached_page(key)
+        if cached is not None:
+            response, meta = cached
+            self.page_cache_hit(meta)
+            return response
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and hasattr(response, 'add_post_render_callback'):
+            response.add_post_render_callback(lambda rendered: self.cache_page(key, rendered))
+        return response
+
+    def cache_page(self, key, response):
+        # Ответы, устанавливающие cookie, относятся к конкретному посетителю и не кешируются
+        if response.cookies:
+            return
+        context = response.context_data
+        store_page(key, response, self.get_page_cache_keys(context), self.get_page_cache_meta(context),
+                   self.page_cache_timeout or settings.PAGE_CACHE_TIMEOUT)
+
+
+class ConditionalGetMixin:
+    # ETag и Last-Modified из get_validators(): при неизменных данных ответ 304 без рендеринга шаблона
+
+    def get_validators(self):
+        return None
+
+    def not_modified(self):
+        pass
+
+    def dispatch(self, request, *args, **kwargs):
+        return conditional_get(request, self.get_validators,
+                               lambda: super(ConditionalGetMixin, self).dispatch(request, *args, **kwargs),
+                               self.not_modified)
@@ -0,0 +1,67 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+from .redis_client import get_redis_connection
+from .utils import has_pending_messages
+
+
+def page_cache_key(request):
+    return f'page:{md5(request.build_absolute_uri().encode()).hexdigest()}'
+
+
+def surrogate_key(key):
+    # Множество Redis с ключами кешированных страниц, помеченных суррогатным ключом
+    return f'surrogate:{key}'
+
+
+def is_page_cacheable(request):
+    # Кешируются только GET/HEAD анонимных посетителей без отложенных сообщений (messages)
+    return (
+        settings.PAGE_CACHE_ENABLED
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not has_pending_messages(request)
+    )
+
+
+def get_cached_page(key):
+    # (HttpResponse, meta) или None
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['X-Page-Cache'] = 'hit'
+    return response, entry['meta']
+
+
+def store_page(key, response, surrogate_keys, meta, timeout):
+    cache.set(key, {'content': response.content, 'content_type': response['Content-Type'], 'meta': meta}, timeout)
+    # Множества живут не меньше страниц, которые в них записаны
+    pipeline = get_redis_connection().pipeline(transaction=False)
+    for surrogate in set(surrogate_keys):
+        pipeline.sadd(surrogate_key(surrogate), key)
+        pipeline.expire(surrogate_key(surrogate), timeout)
+    pipeline.execute()
+    response['X-Page-Cache'] = 'miss'
+
+
+def purge_surrogate_keys(*keys):
+    # Удаление всех страниц, помеченных хотя бы одним из суррогатных ключей
+    keys = [surrogate_key(key) for key in set(keys)]
+    if not keys:
+        return 0
+    pipeline = get_redis_connection().pipeline()
+    pipeline.sunion(keys)
+    pipeline.delete(*keys)
+    pages, _ = pipeline.execute()
+    cache.delete_many([page.decode() for page in pages])
+    return len(pages)
+
+
+def purge_pages_on_commit(*keys):
+    # После фиксации транзакции, чтобы следующий запрос не закешировал страницу со старыми данными
+    transaction.on_commit(lambda: purge_surrogate_keys(*keys))
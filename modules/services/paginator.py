@@ -0,0 +1,150 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.db.models import Q
+from django.utils.http import urlencode
+
+
+CURSOR_SALT = 'modules.services.paginator'
+
+
+def parse_ordering(ordering):
+    # ('-fixed', 'id') -> [('fixed', True), ('id', False)]
+    return [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+
+def encode_cursor(values, forward):
+    # Даты и Decimal передаются строками: БД приводит их обратно к типу поля без потери точности
+    values = [value.isoformat() if isinstance(value, (date, datetime))
+              else str(value) if isinstance(value, Decimal) else value for value in values]
+    return signing.dumps({'v': values, 'f': forward}, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token):
+    # Возвращает (значения, направление) или None для поврежденного курсора
+    try:
+        payload = signing.loads(token, salt=CURSOR_SALT)
+        return payload['v'], payload['f']
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+
+
+def keyset_filter(ordering, values, forward):
+    # Условие "строго после (или до) строки с values" в порядке сортировки ordering
+    condition = Q()
+    for index, (field, descending) in enumerate(ordering):
+        lookup = 'lt' if descending == forward else 'gt'
+        step = Q(**{f'{field}__{lookup}': values[index]})
+        for previous_index, (previous_field, _) in enumerate(ordering[:index]):
+            step &= Q(**{previous_field: values[previous_index]})
+        condition |= step
+    # Нестрогая граница по первому полю позволяет БД начать просмотр индекса с нужного места
+    first_field, first_descending = ordering[0]
+    bound = 'lte' if first_descending == forward else 'gte'
+    return Q(**{f'{first_field}__{bound}': values[0]}) & condition
+
+
+class CursorPage:
+    # Страница курсорной пагинации. Совместима с шаблонами, использующими page_obj и object_list.
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.next_url = None
+        self.previous_url = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_cursor(self):
+        if self.has_next_page and self.object_list:
+            return encode_cursor(self.paginator.cursor_values(self.object_list[-1]), forward=True)
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous_page and self.object_list:
+            return encode_cursor(self.paginator.cursor_values(self.object_list[0]), forward=False)
+
+    def build_urls(self, query_params, cursor_param='cursor'):
+        # Ссылки на соседние страницы с сохранением остальных GET-параметров (например, строки поиска)
+        params = {key: value for key, value in query_params.items() if key not in (cursor_param, 'page')}
+        if self.next_cursor:
+            self.next_url = '?' + urlencode({**params, cursor_param: self.next_cursor})
+        if self.previous_cursor:
+            self.previous_url = '?' + urlencode({**params, cursor_param: self.previous_cursor})
+
+    @property
+    def total_count(self):
+        # Подсчет ограничен count_limit + 1 строкой: лишняя строка нужна только для признака "+"
+        count_limit = self.paginator.count_limit
+        if count_limit is None:
+            return self.paginator.estimated_count
+        return min(self.paginator.estimated_count, count_limit)
+
+    @property
+    def total_count_is_capped(self):
+        count_limit = self.paginator.count_limit
+        return count_limit is not None and self.paginator.estimated_count > count_limit
+
+
+class CursorPaginator:
+    """
+    Курсорная (keyset) пагинация: вместо OFFSET страница выбирается условием по полям сортировки
+    относительно последней строки предыдущей страницы, поэтому стоимость не зависит от номера страницы.
+    Последнее поле ordering должно быть уникальным (обычно id).
+    """
+    def __init__(self, queryset, per_page, ordering, count_limit=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = parse_ordering(ordering)
+        self.count_limit = count_limit
+
+    def cursor_values(self, obj):
+        return [getattr(obj, field) for field, _ in self.ordering]
+
+    def order_by(self, forward):
+        return [f'-{field}' if descending == forward else field for field, descending in self.ordering]
+
+    def get_page(self, cursor=None):
+        decoded = decode_cursor(cursor) if cursor else None
+        values, forward = decoded if decoded else (None, True)
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(keyset_filter(self.ordering, values, forward))
+        rows = list(queryset.order_by(*self.order_by(forward))[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            return CursorPage(rows, self, has_next=has_more, has_previous=values is not None)
+        rows.reverse()
+        return CursorPage(rows, self, has_next=True, has_previous=has_more)
+
+    @property
+    def estimated_count(self):
+        # Оценка количества: COUNT по выборке, ограниченной count_limit + 1 строками
+        if not hasattr(self, '_estimated_count'):
+            queryset = self.queryset.order_by()
+            if self.count_limit is not None:
+                queryset = queryset[:self.count_limit + 1]
+            self._estimated_count = queryset.count()
+        return self._estimated_count
@@ -0,0 +1,10 @@
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def get_redis_connection():
+    # Общее подключение к Redis для структур, которых нет в API кеша Django (списки, множества, скрипты)
+    return redis.Redis.from_url(settings.REDIS_URL)
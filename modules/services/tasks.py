@@ -1,7 +1,9 @@
 from celery import shared_task
+from django.apps import apps
 from django.core.management import call_command
 
 from .email import send_contact_email_message, send_activate_email_message
+from .images import generate_image_variants, image_variants_ready
 
 
 @shared_task
@@ -22,3 +24,17 @@ def send_activate_email_message_task(user_id):
 def dbackup_task():
     # Выполнение резервного копирования базы данных
     call_command('dbackup')
+
+
+@shared_task
+def generate_image_variants_task(model_label, pk, field_name):
+    # 1. Задача ставится сигналами после загрузки превью статьи или аватара (modules/blog/signals.py)
+    # 2. После создания вариантов сигнал image_variants_ready сбрасывает кеш HTML с этим изображением
+    model = apps.get_model(model_label)
+    instance = model._default_manager.filter(pk=pk).first()
+    image = getattr(instance, field_name, None)
+    if not image:
+        return 0
+    created = generate_image_variants(image.name, field_name)
+    image_variants_ready.send(sender=model, instance=instance, field_name=field_name)
+    return len(created)
@@ -0,0 +1,21 @@
+from django import template
+
+from ..images import get_image_variants
+
+register = template.Library()
+
+
+# Адаптивное изображение поля ImageField: <picture> с вариантами WebP и JPEG (srcset), набор ширин
+# по имени поля (IMAGE_VARIANT_WIDTHS). Пока варианты не созданы - исходный файл.
+# {% responsive_image article.thumbnail sizes='33vw' alt=article.title css_class='card-img-top' %}
+@register.inclusion_tag('includes/picture.html')
+def responsive_image(image, sizes, alt='', css_class='', style=''):
+    variants = get_image_variants(image.name, image.field.name) if image else None
+    context = {'image': image, 'sizes': sizes, 'alt': alt, 'css_class': css_class, 'style': style}
+    if variants:
+        context.update({
+            'webp_srcset': ', '.join(f'{url} {width}w' for url, width in variants['webp']),
+            'jpeg_srcset': ', '.join(f'{url} {width}w' for url, width in variants['jpeg']),
+            'fallback_url': variants['jpeg'][-1][0],
+        })
+    return context
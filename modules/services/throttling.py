@@ -0,0 +1,53 @@
+import math
+import time
+
+import redis
+from django.conf import settings
+
+from .redis_client import get_redis_connection
+
+
+# Token bucket: токены пополняются со скоростью rate в секунду до capacity, запрос забирает один токен.
+# Чтение, пересчет и запись выполняются в Redis атомарно за один вызов.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+_token_bucket = None
+
+
+def get_token_bucket():
+    global _token_bucket
+    if _token_bucket is None:
+        _token_bucket = get_redis_connection().register_script(TOKEN_BUCKET_SCRIPT)
+    return _token_bucket
+
+
+def consume_token(scope, identity):
+    # (разрешен ли запрос, через сколько секунд появится токен). При недоступном Redis запросы не ограничиваются.
+    if not settings.THROTTLE_ENABLED or scope not in settings.THROTTLE_RATES:
+        return True, 0
+    capacity, rate = settings.THROTTLE_RATES[scope]
+    try:
+        allowed, retry_after = get_token_bucket()(keys=[f'throttle:{scope}:{identity}'],
+                                                  args=[capacity, rate, time.time()])
+    except redis.RedisError:
+        return True, 0
+    return bool(allowed), math.ceil(float(retry_after))
@@ -1,10 +1,14 @@
+import hashlib
 import os
+import re
+from io import BytesIO
 from uuid import uuid4
 from pytils.translit import slugify
-from base import settings
 from urllib.parse import urljoin
-from datetime import datetime
+from django.conf import settings
+from django.core.files.base import ContentFile
 from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
 from PIL import Image, ImageOps
 
 
@@ -23,30 +27,108 @@ def get_client_ip(request):
     return ip
 
 
-# Изменение места хранения файлов у Ckeditor
+def has_pending_messages(request):
+    # Сообщения django.contrib.messages, еще не показанные посетителю (cookie или сессия)
+    return 'messages' in request.COOKIES or '_messages' in request.session
+
+
+# Возраст записи по-русски: "5 минут назад", "2 часа назад", "21 день назад"
+def get_time_since(value):
+    age_seconds = (timezone.now() - value).total_seconds()
+    for unit_seconds, forms in ((60 * 60 * 24, ('день', 'дня', 'дней')),
+                                (60 * 60, ('час', 'часа', 'часов')),
+                                (60, ('минуту', 'минуты', 'минут'))):
+        number = int(age_seconds / unit_seconds)
+        if number > 0:
+            return f'{number} {ru_plural(number, forms)} назад'
+    return 'Недавно'
+
+
+def ru_plural(number, forms):
+    # Форма слова для числа: (1) минуту, (2-4) минуты, (5-20) минут
+    if number % 10 == 1 and number % 100 != 11:
+        return forms[0]
+    if 2 <= number % 10 <= 4 and not 12 <= number % 100 <= 14:
+        return forms[1]
+    return forms[2]
+
+
+# Параметры пересжатия загрузок редактора по формату Pillow (качество JPEG и WebP - CKEDITOR_UPLOAD_QUALITY)
+UPLOAD_SAVE_OPTIONS = {
+    'JPEG': {'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'method': 6},
+}
+UPLOAD_LOSSY_FORMATS = ('JPEG', 'WEBP')
+UPLOAD_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+
+# Пересжатие изображения из редактора: (байты, расширение). Большие изображения уменьшаются до
+# CKEDITOR_UPLOAD_MAX_SIZE по большей стороне, метаданные EXIF удаляются. Если результат не меньше
+# исходника и уменьшать было нечего, возвращается исходник. Анимация, поврежденные файлы
+# и не изображения не меняются.
+def optimize_upload(data, name):
+    extension = os.path.splitext(name)[1].lower()
+    try:
+        image = Image.open(BytesIO(data))
+        image_format = image.format
+        if image_format not in UPLOAD_SAVE_OPTIONS or getattr(image, 'is_animated', False):
+            return data, extension
+        # Image.open читает только заголовок: ошибки декодирования возникают дальше
+        image = ImageOps.exif_transpose(image)
+        max_size = settings.CKEDITOR_UPLOAD_MAX_SIZE
+        resized = image.width > max_size or image.height > max_size
+        if resized:
+            image.thumbnail((max_size, max_size), Image.LANCZOS)
+        if image_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        options = dict(UPLOAD_SAVE_OPTIONS[image_format])
+        if image_format in UPLOAD_LOSSY_FORMATS:
+            options['quality'] = settings.CKEDITOR_UPLOAD_QUALITY
+        output = BytesIO()
+        image.save(output, format=image_format, **options)
+    except (OSError, Image.DecompressionBombError):
+        return data, extension
+    if not resized and output.tell() >= len(data):
+        return data, UPLOAD_EXTENSIONS[image_format]
+    return output.getvalue(), UPLOAD_EXTENSIONS[image_format]
+
+
 class CkeditorCustomStorage(FileSystemStorage):
-    def get_folder_name(self):
-        return datetime.now().strftime('%y/%m/%d')
+    """
+    Хранилище загрузок CKEditor с адресацией по содержимому: имя файла - SHA-256 исходных байтов
+    (ab/cd/abcd....jpg). Повторная загрузка того же файла возвращает уже сохраненный без записи,
+    новые изображения перед записью пересжимаются (optimize_upload).
+    """
+    CONTENT_NAME_RE = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+    def __init__(self, location=None, base_url=None, **kwargs):
+        # Каталог uploads/ внутри MEDIA_ROOT текущих настроек (не фиксируется при импорте модуля)
+        super().__init__(
+            location=location or os.path.join(settings.MEDIA_ROOT, 'uploads/'),
+            base_url=base_url or urljoin(settings.MEDIA_URL, 'uploads/'),
+            **kwargs,
+        )
+
+    @staticmethod
+    def content_name(digest, extension):
+        return f'{digest[:2]}/{digest[2:4]}/{digest}{extension}'
 
-    def get_valid_name(self, name):
-        return name
+    def find_existing(self, digest):
+        # Файл с тем же хешем (расширение могло измениться при пересжатии)
+        folder = os.path.dirname(self.content_name(digest, ''))
+        if self.exists(folder):
+            for file_name in self.listdir(folder)[1]:
+                if os.path.splitext(file_name)[0] == digest:
+                    return f'{folder}/{file_name}'
+        return None
 
     def _save(self, name, content):
-        folder_name = self.get_folder_name()
-        name = os.path.join(folder_name, self.get_valid_name(name))
-        return super()._save(name, content)
-
-    location = os.path.join(settings.MEDIA_ROOT, 'uploads/')
-    base_url = urljoin(settings.MEDIA_URL, 'uploads/')
-
-
-# Оптимизация изображений
-def image_compress(image_path, height, width):
-    img = Image.open(image_path)
-    if img.mode != 'RGB':
-        img = img.convert('RGB')
-    if img.height > height or img.width > width:
-        output_size = (height, width)
-        img.thumbnail(output_size)
-    img = ImageOps.exif_transpose(img)
-    img.save(image_path, format='JPEG', quality=90, optimize=True)
+        content.seek(0)
+        data = content.read()
+        digest = hashlib.sha256(data).hexdigest()
+        existing = self.find_existing(digest)
+        if existing is not None:
+            return existing
+        data, extension = optimize_upload(data, name)
+        return super()._save(self.content_name(digest, extension), ContentFile(data))
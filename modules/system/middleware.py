@@ -1,16 +1,10 @@
-from django.contrib.auth.models import User
-from django.core.cache import cache
-from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
 
+from .presence import touch
+
 
 class ActiveUserMiddleware(MiddlewareMixin):
     def process_request(self, request):
         if request.user.is_authenticated and request.session.session_key:
-            cache_key = f"last-seen-{request.user.id}"
-            last_login = cache.get(cache_key)
-
-            if not last_login:
-                User.objects.filter(id=request.user.id).update(last_login=timezone.now())
-                # Делаем кеширование 300 секунд
-                cache.set(cache_key, timezone.now(), 300)
+            # Время посещения пишется в Redis, в last_login его переносит задача flush_last_seen_task
+            touch(request.user.id)
@@ -4,10 +4,9 @@ from django.contrib.auth import get_user_model
 from django.core.validators import FileExtensionValidator
 from django.dispatch import receiver
 from django.urls import reverse
-from django.utils import timezone
-from django.core.cache import cache
 
 from modules.services.utils import unique_slugify
+from .presence import get_online_statuses
 
 User = get_user_model()
 
@@ -39,6 +38,13 @@ class Profile(models.Model):
         verbose_name = 'Профиль',
         verbose_name_plural = 'Профили'
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Имя аватара до изменения: новый аватар получает варианты размеров в Celery
+        self.initial_avatar = self.__dict__.get('avatar') if self.pk else None
+        # Адрес профиля до изменения: ссылка на профиль выводится в кешированных ветках комментариев
+        self.initial_slug = self.__dict__.get('slug') if self.pk else None
+
     def save(self, *args, **kwargs):
         # Сохранение полей модели, если они не заполнены
         if not self.slug:
@@ -50,10 +56,10 @@ class Profile(models.Model):
         return reverse('profile_detail', kwargs={'slug': self.slug})
 
     def is_online(self):
-        last_seen = cache.get(f"last-seen-{self.user.id}")
-        if last_seen is not None and timezone.now() < last_seen + timezone.timedelta(seconds=300):
-            return True
-        return False
+        # Статус, проставленный заранее для всей страницы (presence.annotate_online), или отдельный запрос к кешу
+        if not hasattr(self, 'online'):
+            self.online = get_online_statuses([self.user_id])[self.user_id]
+        return self.online
 
     def __str__(self):
         return self.user.username
@@ -0,0 +1,87 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from modules.services.redis_client import get_redis_connection
+
+
+def pending_key():
+    # Посещения, еще не перенесенные в БД
+    return f'{settings.USER_LAST_SEEN_KEY}:pending'
+
+
+def flushing_key():
+    # Снимок посещений, который сейчас переносит flush_last_seen
+    return f'{settings.USER_LAST_SEEN_KEY}:flushing'
+
+
+def touch(user_id):
+    # Отметка о посещении: ZADD в множество статусов и в множество для переноса в БД за один сетевой вызов
+    now = time.time()
+    pipe = get_redis_connection().pipeline(transaction=False)
+    pipe.zadd(settings.USER_LAST_SEEN_KEY, {user_id: now})
+    pipe.zadd(pending_key(), {user_id: now})
+    pipe.execute()
+
+
+def online_since():
+    return time.time() - settings.USER_ONLINE_TIMEOUT
+
+
+def get_online_statuses(user_ids):
+    # Статус "в сети" для набора пользователей за один сетевой вызов (pipeline из ZSCORE): {user_id: bool}
+    user_ids = list(set(user_ids))
+    pipe = get_redis_connection().pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.zscore(settings.USER_LAST_SEEN_KEY, user_id)
+    threshold = online_since()
+    return {user_id: score is not None and score > threshold for user_id, score in zip(user_ids, pipe.execute())}
+
+
+def annotate_online(profiles):
+    # Проставляет профилям статус заранее, после этого Profile.is_online() не обращается к Redis
+    profiles = list(profiles)
+    statuses = get_online_statuses(profile.user_id for profile in profiles)
+    for profile in profiles:
+        profile.online = statuses[profile.user_id]
+    return profiles
+
+
+def get_online_count():
+    return get_redis_connection().zcount(settings.USER_LAST_SEEN_KEY, online_since(), '+inf')
+
+
+def save_last_seen(entries):
+    # Один UPDATE на пачку пользователей
+    users = [get_user_model()(id=int(user_id), last_login=datetime.fromtimestamp(score, tz=dt_timezone.utc))
+             for user_id, score in entries]
+    get_user_model().objects.bulk_update(users, ['last_login'], batch_size=settings.USER_LAST_SEEN_BATCH_SIZE)
+    return len(users)
+
+
+def flush_last_seen():
+    """
+    Перенос посещений в User.last_login. Множество для переноса атомарно переименовывается в снимок (RENAME):
+    посещения после этого попадают в новое множество, поэтому удаляются ровно те записи, что записаны в БД.
+    При ошибке снимок остается и переносится следующим запуском. Одновременно работает один перенос.
+    """
+    redis = get_redis_connection()
+    lock = redis.lock(f'{settings.USER_LAST_SEEN_KEY}:lock', timeout=settings.USER_LAST_SEEN_FLUSH_LOCK_TIMEOUT,
+                      blocking=False)
+    if not lock.acquire():
+        return 0
+    try:
+        # Снимок, оставшийся после сбоя прошлого переноса
+        saved = save_last_seen(redis.zrange(flushing_key(), 0, -1, withscores=True))
+        redis.delete(flushing_key())
+        if redis.exists(pending_key()):
+            redis.rename(pending_key(), flushing_key())
+            saved += save_last_seen(redis.zrange(flushing_key(), 0, -1, withscores=True))
+            redis.delete(flushing_key())
+        # Множество статусов нужно только для "в сети", старые записи в БД уже перенесены
+        redis.zremrangebyscore(settings.USER_LAST_SEEN_KEY, '-inf', time.time() - settings.USER_LAST_SEEN_RETENTION)
+        return saved
+    finally:
+        lock.release()
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .presence import flush_last_seen
+
+
+@shared_task
+def flush_last_seen_task():
+    # Перенос времени последнего посещения пользователей из Redis в БД (CELERY_BEAT_SCHEDULE)
+    return flush_last_seen()
@@ -0,0 +1,18 @@
+from django import template
+
+from ..presence import annotate_online, get_online_count
+
+register = template.Library()
+
+
+# Профили страницы со статусом "в сети", полученным одним запросом к кешу:
+# {% with_presence profile.followers.all as followers %}
+@register.simple_tag
+def with_presence(profiles):
+    return annotate_online(profiles)
+
+
+# Количество пользователей в сети: {% online_users_count %}
+@register.simple_tag
+def online_users_count():
+    return get_online_count()
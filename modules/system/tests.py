@@ -1,3 +1,38 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from .presence import flush_last_seen, flushing_key, get_online_statuses, pending_key, touch
+from modules.services.redis_client import get_redis_connection
+
+
+User = get_user_model()
+
+
+@override_settings(USER_LAST_SEEN_KEY='test:presence:last_seen')
+class FlushLastSeenTest(TestCase):
+
+    def setUp(self):
+        self.redis = get_redis_connection()
+        self.keys = ('test:presence:last_seen', pending_key(), flushing_key())
+        self.redis.delete(*self.keys)
+        self.addCleanup(self.redis.delete, *self.keys)
+        self.users = [User.objects.create_user(username=f'user{number}', password='password') for number in range(2)]
+
+    def test_flushes_each_visit_once(self):
+        for user in self.users:
+            touch(user.id)
+        self.assertEqual(flush_last_seen(), 2)
+        self.assertFalse(User.objects.filter(last_login__isnull=True).exists())
+        self.assertEqual(flush_last_seen(), 0)
+        self.assertEqual(self.redis.exists(pending_key(), flushing_key()), 0)
+        # Статус "в сети" не зависит от переноса в БД
+        self.assertEqual(get_online_statuses([user.id for user in self.users]),
+                         {user.id: True for user in self.users})
+
+    def test_visit_after_flush_is_kept(self):
+        touch(self.users[0].id)
+        flush_last_seen()
+        first_login = User.objects.get(id=self.users[0].id).last_login
+        touch(self.users[0].id)
+        self.assertEqual(flush_last_seen(), 1)
+        self.assertGreater(User.objects.get(id=self.users[0].id).last_login, first_login)
@@ -15,7 +15,7 @@ from django.http import JsonResponse
 from .models import Profile, Feedback
 from .forms import (UserUpdateForm, ProfileUpdateForm, UserRegisterForm, UserLoginForm, UserPasswordChangeForm,
                     UserForgotPasswordForm, UserSetNewPasswordForm, FeedbackCreateForm)
-from ..services.mixins import UserIsNotAuthenticated
+from ..services.mixins import UserIsNotAuthenticated, ThrottleMixin
 from ..services.utils import get_client_ip
 from ..services.tasks import send_contact_email_message_task, send_activate_email_message_task
 
@@ -190,8 +190,9 @@ class UserPasswordResetConfirmView(SuccessMessageMixin, PasswordResetConfirmView
         return context
 
 
-class FeedbackCreateView(SuccessMessageMixin, CreateView):
+class FeedbackCreateView(ThrottleMixin, SuccessMessageMixin, CreateView):
     model = Feedback
+    throttle_scope = 'feedback'
     form_class = FeedbackCreateForm
     success_message = 'Ваше письмо успешно отправлено администрации сайта'
     template_name = 'system/feedback.html'
@@ -210,8 +211,9 @@ class FeedbackCreateView(SuccessMessageMixin, CreateView):
 
 # Создание подписки для пользователя
 @method_decorator(login_required, name='dispatch')
-class ProfileFollowingCreateView(View):
+class ProfileFollowingCreateView(ThrottleMixin, View):
     model = Profile
+    throttle_scope = 'following'
 
     def is_ajax(self):
         return self.request.headers.get('X-Requested-With') == 'XMLHttpRequest'
@@ -1,26 +1,85 @@
+// Форма выводится только авторизованным пользователям, загрузка комментариев и ответов - всем
 const commentForm = document.forms.commentForm;
-const commentFormContent = commentForm.content;
-const commentFormParentInput = commentForm.parent;
-const commentFormSubmit = commentForm.commentSubmit;
-const commentArticleId = commentForm.getAttribute('data-article-id');
 
-commentForm.addEventListener('submit', createComment);
+const commentsContainer = document.querySelector('.nested-comments');
+const commentsMoreButton = document.querySelector('.btn-comments-more');
 
-replyUser()
+if (commentForm) {
+  commentForm.addEventListener('submit', createComment);
+}
+
+// Один обработчик на контейнер: кнопки ответа и загрузки ответов появляются в подгружаемом HTML
+commentsContainer.addEventListener('click', event => {
+  const replyButton = event.target.closest('.btn-reply');
+  const repliesButton = event.target.closest('.btn-replies');
+  if (replyButton && commentForm) {
+    replyComment(replyButton);
+  }
+  else if (repliesButton) {
+    loadReplies(repliesButton);
+  }
+});
+
+if (commentsMoreButton) {
+  commentsMoreButton.addEventListener('click', loadMoreComments);
+}
 
-function replyUser() {
-  document.querySelectorAll('.btn-reply').forEach(e => {
-    e.addEventListener('click', replyComment);
-  });
+function replyComment(button) {
+  const commentUsername = button.getAttribute('data-comment-username');
+  const commentMessageId = button.getAttribute('data-comment-id');
+  commentForm.content.value = `${commentUsername}, `;
+  commentForm.parent.value = commentMessageId;
 }
 
-function replyComment() {
-  const commentUsername = this.getAttribute('data-comment-username');
-  const commentMessageId = this.getAttribute('data-comment-id');
-  commentFormContent.value = `${commentUsername}, `;
-  commentFormParentInput.value = commentMessageId;
+async function fetchComments(url) {
+  const response = await fetch(url, {headers: {'X-Requested-With': 'XMLHttpRequest'}});
+  return response.json();
+}
+
+async function loadMoreComments() {
+  // Следующая страница корневых комментариев
+  commentsMoreButton.disabled = true;
+  try {
+    const page = await fetchComments(commentsMoreButton.dataset.url);
+    commentsContainer.insertAdjacentHTML('beforeend', page.html);
+    if (page.next_url) {
+      commentsMoreButton.dataset.url = page.next_url;
+      commentsMoreButton.disabled = false;
+    }
+    else {
+      commentsMoreButton.remove();
+    }
+  }
+  catch (error) {
+    commentsMoreButton.disabled = false;
+    console.log(error)
+  }
+}
+
+async function loadReplies(button) {
+  // Ветка ответов на корневой комментарий вставляется на место кнопки
+  button.disabled = true;
+  try {
+    const replies = await fetchComments(button.dataset.url);
+    const template = document.createElement('template');
+    template.innerHTML = replies.html;
+    // Ответы, уже добавленные на страницу через форму, приходят и в загруженной ветке
+    template.content.querySelectorAll('[id^="comment-thread-"]').forEach(thread => {
+      const added = document.getElementById(thread.id);
+      if (added) {
+        added.remove();
+      }
+    });
+    button.replaceWith(template.content);
+  }
+  catch (error) {
+    button.disabled = false;
+    console.log(error)
+  }
 }
 async function createComment(event) {
+    const commentFormSubmit = commentForm.commentSubmit;
+    const commentArticleId = commentForm.getAttribute('data-article-id');
     event.preventDefault();
     commentFormSubmit.disabled = true;
     commentFormSubmit.innerText = "Ожидаем ответа сервера";
@@ -34,6 +93,13 @@ async function createComment(event) {
             body: new FormData(commentForm),
         });
         const comment = await response.json();
+        if (response.status === 429) {
+            // Превышен лимит частоты отправки комментариев
+            alert(comment.error);
+            commentFormSubmit.disabled = false;
+            commentFormSubmit.innerText = "Добавить комментарий";
+            return;
+        }
 
         let commentTemplate = `<ul id="comment-thread-${comment.id}">
                                 <li class="card border-0">
@@ -66,8 +132,7 @@ async function createComment(event) {
         commentForm.reset()
         commentFormSubmit.disabled = false;
         commentFormSubmit.innerText = "Добавить комментарий";
-        commentFormParentInput.value = null;
-        replyUser();
+        commentForm.parent.value = null;
     }
     catch (error) {
         console.log(error)
@@ -10,6 +10,11 @@ followBtn.addEventListener('click', event => {
             "X-Requested-With": "XMLHttpRequest",
     }}).then(response => response.json())
     .then(data => {
+        if (data.error) {
+            // Превышен лимит частоты запросов
+            alert(data.error);
+            return;
+        }
         const isBtnPrimary = followBtn.classList.contains('btn-primary');
         const message = data.message || '';
 
@@ -21,6 +21,11 @@ ratingButtons.forEach(button => {
             body: formData
         }).then(response => response.json())
         .then(data => {
+            if (data.error) {
+                // Превышен лимит частоты запросов
+                alert(data.error);
+                return;
+            }
             // Обновляем значение на кнопке
             ratingSum.textContent = data.rating_sum;
         })
@@ -0,0 +1,70 @@
+const searchInput = document.getElementById('search');
+const searchSuggestions = document.getElementById('search-suggestions');
+let suggestTimer = null;
+let suggestController = null;
+
+const hideSuggestions = () => {
+    searchSuggestions.classList.add('d-none');
+    searchSuggestions.innerHTML = '';
+};
+
+const suggestionLink = (url, text, label) => {
+    const link = document.createElement('a');
+    link.href = url;
+    link.className = 'list-group-item list-group-item-action';
+    link.textContent = text;
+    if (label) {
+        const badge = document.createElement('span');
+        badge.className = 'badge bg-secondary ms-2';
+        badge.textContent = label;
+        link.appendChild(badge);
+    }
+    return link;
+};
+
+const renderSuggestions = (data) => {
+    searchSuggestions.innerHTML = '';
+    data.articles.forEach(article => searchSuggestions.appendChild(suggestionLink(article.url, article.title)));
+    data.tags.forEach(tag => searchSuggestions.appendChild(suggestionLink(tag.url, tag.name, 'тег')));
+    searchSuggestions.classList.toggle('d-none', !searchSuggestions.children.length);
+};
+
+if (searchInput && searchSuggestions) {
+    searchInput.addEventListener('input', () => {
+        // Запрос подсказок после паузы в наборе, предыдущий незавершенный запрос отменяется
+        clearTimeout(suggestTimer);
+        const query = searchInput.value.trim();
+        if (query.length < 2) {
+            hideSuggestions();
+            return;
+        }
+        suggestTimer = setTimeout(() => {
+            if (suggestController) {
+                suggestController.abort();
+            }
+            suggestController = new AbortController();
+            fetch(`${searchInput.dataset.suggestUrl}?do=${encodeURIComponent(query)}`, {
+                headers: {"X-Requested-With": "XMLHttpRequest"},
+                signal: suggestController.signal,
+            }).then(response => response.json())
+            .then(renderSuggestions)
+            .catch(error => {
+                if (error.name !== 'AbortError') {
+                    console.error(error);
+                }
+            });
+        }, 250);
+    });
+
+    searchInput.addEventListener('keydown', event => {
+        if (event.key === 'Escape') {
+            hideSuggestions();
+        }
+    });
+
+    document.addEventListener('click', event => {
+        if (!searchInput.form.contains(event.target)) {
+            hideSuggestions();
+        }
+    });
+}